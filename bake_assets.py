@@ -0,0 +1,111 @@
+"""Bake display-ready images for Black Moon.
+
+Reads assets/manifest.json (plus start_screen.png and every image used in
+SCENES) and writes pre-scaled, letterboxed raw pixel buffers to assets/baked/,
+in the display's own byte order where possible. At runtime load_baked_image()
+memory-maps them straight into a Surface when they match the current
+resolution, and a single same-layout convert() drops the alpha channel
+frombuffer() adds (skipping decoding and scaling); otherwise the source PNGs
+are used.
+
+    python bake_assets.py                    # current WIDTH x HEIGHT
+    python bake_assets.py 1280x720 1920x1080
+"""
+import os, sys, json, argparse
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")  # inget fönster behövs för att baka
+
+import pygame
+import black_moon_textadventure as game
+from black_moon_util import write_atomic, write_json
+
+START_IMAGE = "start_screen.png"
+
+
+def pixel_format():
+    """Byte layout matching the display surface (XRGB8888 on little-endian is
+       B,G,R,X). frombuffer() has no such layout without alpha, so "BGRA" is
+       the closest; the loaded surface still goes through _to_display()."""
+    if sys.byteorder == "little" and game.screen.get_masks()[:3] == (0xFF0000, 0xFF00, 0xFF):
+        return "BGRA"
+    return "RGB"
+
+
+def manifest_images(assets_dir):
+    """Source filenames listed in manifest.json, falling back to scene_XX.png
+       when an entry's filename is not on disk. Entries with neither are
+       reported and skipped; the scenes' own images are baked regardless."""
+    path = os.path.join(assets_dir, "manifest.json")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+    except (OSError, ValueError) as e:
+        print("Manifest error:", e)
+        entries = []
+    if not isinstance(entries, list):
+        print(f"Manifest error: {path} is not a list of entries")
+        entries = []
+    names = []
+    for n, e in enumerate(entries, start=1):
+        name = e.get("filename") if isinstance(e, dict) else None
+        if not (isinstance(name, str) and name and os.path.isfile(os.path.join(assets_dir, name))):
+            try:
+                name = f"scene_{int(e['index']):02d}.png"
+            except (TypeError, KeyError, ValueError):
+                print(f"Manifest error: {path} entry {n} has no image on disk and no numeric index, skipped")
+                continue
+        names.append(name)
+    return names
+
+
+def bake(sizes, assets_dir=game.ASSETS_DIR, out_dir=game.BAKED_DIR):
+    if game.screen is None:
+        game.init_display()  # convert() och pixelformatet kräver en display
+    os.makedirs(out_dir, exist_ok=True)
+    index_path = os.path.join(out_dir, "index.json")
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = {"version": 1, "images": {}}
+
+    scene_images = list(dict.fromkeys(manifest_images(assets_dir) + [sc["image"] for sc in game.SCENES.values()]))
+    fmt = pixel_format()
+    written = 0
+    for w, h in sizes:
+        jobs = [(name, (w, int(h*0.52)), game._letterbox_scene_image) for name in scene_images]
+        jobs.append((START_IMAGE, (w, h), game._letterbox_start_image))
+        for name, size, letterbox in jobs:
+            src = os.path.join(assets_dir, name)
+            if not os.path.exists(src):
+                print(f"skip {name}: missing")
+                continue
+            surf = letterbox(pygame.image.load(src).convert(), size)
+            rel = f"{w}x{h}/{os.path.splitext(name)[0]}.{fmt.lower()}"
+            path = os.path.join(out_dir, rel)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            write_atomic(path, pygame.image.tostring(surf, fmt))
+            st = os.stat(src)
+            index["images"][f"{size[0]}x{size[1]}/{name}"] = {
+                "file": rel, "format": fmt, "size": list(size),
+                "source_size": st.st_size, "source_mtime_ns": st.st_mtime_ns,
+            }
+            written += 1
+            print(f"baked {name} -> {rel} ({size[0]}x{size[1]})")
+
+    write_json(index_path, index, indent=2)
+    return written
+
+
+def parse_size(text):
+    w, _, h = text.lower().partition("x")
+    return int(w), int(h)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Bake pre-scaled scene images for Black Moon.")
+    ap.add_argument("sizes", nargs="*", type=parse_size, help="window sizes as WxH (default: game resolution)")
+    args = ap.parse_args()
+    n = bake(args.sizes or [(game.WIDTH, game.HEIGHT)])
+    print(f"{n} images baked into {game.BAKED_DIR}")
+    sys.exit(0 if n else 1)
@@ -0,0 +1,352 @@
+"""Arcade rules for Black Moon, without pygame.
+
+ArcadeSim holds the rules every mode shares; ChaseSim (the car chase after
+Nina) and TurboSim (collect turbo pickups in the tower) plug in their own
+entities and win condition. A sim holds the whole simulation state and
+advances one fixed tick of FRAME_MS per step(); speeds are pixels per tick.
+Timers count whole ticks and are compared with their millisecond settings
+in integer arithmetic, so no float error builds up over a run. The game steps the sim
+from an accumulator of real time and interpolates between the last two
+ticks when drawing, so a run plays the same at any frame rate.
+Randomness comes from a per-run random.Random(seed), so the same seed and
+the same inputs always give the same run, in the game or headless. The
+pygame loops in black_moon_textadventure only read the sims and draw them.
+
+Headless balancing runs the same rules with an input policy and no frame
+limit:
+
+    python black_moon_arcade.py chase --runs 2000
+    python black_moon_arcade.py turbo --runs 2000 --skill 0.6 --sweep needed=8,10,12 --target 0.7
+"""
+import sys, time, random, argparse
+from array import array
+
+from black_moon_engine import ARCADE_WON, ARCADE_CRASHED, ARCADE_SCENE_KEY, ARCADE_TURBO_KEY
+
+WIDTH, HEIGHT = 1280, 720       # spelplanen är lika stor som fönstret
+FPS = 60                        # simuleringssteg per sekund, oberoende av bildtakten
+FRAME_MS = 1000 / FPS           # simulerad tid per steg (för klienten; reglerna räknar hela steg)
+NINA_SHOW_MS = 2000             # så länge Nina syns i biljakten
+
+CAR_W, CAR_H = 52, 90
+OBSTACLE = 50
+PICKUP = 40
+
+
+def longer_than(ticks, ms):
+    """True when `ticks` steps last longer than `ms`, without float rounding."""
+    return ticks * 1000 > ms * FPS
+
+
+def overlaps(ax, ay, aw, ah, bx, by, bw, bh):
+    """Same test as pygame.Rect.colliderect."""
+    return ax < bx + bw and bx < ax + aw and ay < by + bh and by < ay + ah
+
+
+class EntityPool:
+    """Same-sized entities (obstacles or pickups) stored as parallel int arrays.
+       advance() moves, collision-tests and culls the whole pool in one pass;
+       removal swaps the last entity into the hole, so a frame allocates
+       nothing. Capacity doubles on the rare spawn that overflows it."""
+
+    def __init__(self, w, h, capacity=256):
+        self.w, self.h = w, h
+        self.x = array("i", [0]) * capacity
+        self.y = array("i", [0]) * capacity
+        self.n = 0
+
+    def __len__(self):
+        return self.n
+
+    def __iter__(self):
+        x, y = self.x, self.y
+        for i in range(self.n):
+            yield x[i], y[i]
+
+    def spawn(self, x, y):
+        if self.n == len(self.x):
+            self.x.extend(self.x)
+            self.y.extend(self.y)
+        self.x[self.n] = x
+        self.y[self.n] = y
+        self.n += 1
+
+    def clear(self):
+        self.n = 0
+
+    def advance(self, dy, bx, by, bw, bh, bottom):
+        """Move every entity down by dy. Entities overlapping the box (bx, by,
+           bw, bh) or reaching `bottom` are removed; returns the overlap count."""
+        x, y = self.x, self.y
+        # Kollision (som colliderect) kräver bx-w < x < bx+bw och by-h < y < by+bh
+        left, right = bx - self.w, bx + bw
+        top, low = by - self.h, by + bh
+        hits = 0
+        n = self.n
+        for i in range(n - 1, -1, -1):
+            yi = y[i] + dy
+            hit = top < yi < low and left < x[i] < right
+            if hit or yi >= bottom:
+                hits += hit
+                n -= 1
+                x[i] = x[n]
+                y[i] = y[n]
+            else:
+                y[i] = yi
+        self.n = n
+        return hits
+
+
+class ArcadeSim:
+    """Rules shared by every arcade mode: steer the car, spawn falling
+       obstacles every spawn_ms, and crash out after max_hits hits. A mode
+       adds its own entities and win condition through the hooks below."""
+
+    def __init__(self, seed=None, max_hits=3, obstacle_speed=10, car_speed=9, spawn_ms=700,
+                 per_spawn=1):
+        self.rng = random.Random(seed)
+        self.max_hits = max_hits
+        self.obstacle_speed = obstacle_speed
+        self.car_speed = car_speed
+        self.spawn_ms = spawn_ms
+        self.per_spawn = per_spawn      # hinder per spawn-intervall (täthet)
+
+        self.car_x, self.car_y = WIDTH//2 - CAR_W//2, HEIGHT - 120
+        self.prev_car_x = self.car_x    # före senaste steget, för interpolerad ritning
+        self.obstacles = EntityPool(OBSTACLE, OBSTACLE)
+        self.spawn_ticks = 0            # steg sedan senaste hinder
+        self.frame = 0
+        self.hits = 0
+        self.outcome = None
+
+    @property
+    def elapsed_ms(self):
+        return self.frame * 1000 // FPS
+
+    def step(self, left, right):
+        """Advance one tick with the given steering; returns the outcome once decided."""
+        rng = self.rng
+        self.frame += 1
+
+        # --- Input / rörelse ---
+        self.prev_car_x = self.car_x
+        if left:
+            self.car_x -= self.car_speed
+        if right:
+            self.car_x += self.car_speed
+        self.car_x = max(0, min(WIDTH - CAR_W, self.car_x))
+
+        # --- Spawn hinder med intervall (ms) ---
+        self.spawn_ticks += 1
+        if longer_than(self.spawn_ticks, self.spawn_ms):
+            self.spawn_ticks = 0
+            for _ in range(self.per_spawn):
+                self.obstacles.spawn(rng.randint(20, WIDTH - 70), -60)
+        self.spawn()
+
+        # --- Uppdatera hinder + kollisioner ---
+        self.hits += self.obstacles.advance(self.obstacle_speed, self.car_x, self.car_y,
+                                            CAR_W, CAR_H, HEIGHT + 60)
+        self.update()
+
+        # --- Slutvillkor ---
+        if self.hits >= self.max_hits:
+            self.outcome = ARCADE_CRASHED
+        elif self.won():
+            self.outcome = ARCADE_WON
+        return self.outcome
+
+    # Hooks för respektive läge, anropas en gång per steg
+    def spawn(self):
+        pass
+
+    def update(self):
+        pass
+
+    def won(self):
+        return False
+
+
+class ChaseSim(ArcadeSim):
+    """Biljakt: vänster/höger för att undvika hinder och jaga Nina. Överlev
+       duration_sec sekunder; max_hits krockar ger ARCADE_CRASHED."""
+
+    def __init__(self, seed=None, duration_sec=18, max_hits=3, obstacle_speed=10, car_speed=9,
+                 spawn_ms=700, per_spawn=1):
+        super().__init__(seed, max_hits, obstacle_speed, car_speed, spawn_ms, per_spawn)
+        self.duration_sec = duration_sec
+        self.nina_x, self.nina_y = WIDTH//2 - CAR_W//2, HEIGHT//2 - 100
+        self.nina_ticks = 0             # steg kvar som Nina syns
+
+    @property
+    def time_left(self):
+        return max(0, self.duration_sec - self.frame // FPS)
+
+    @property
+    def nina_visible(self):
+        return self.nina_ticks > 0
+
+    def update(self):
+        # Slumpa Ninas närvaro, visas i NINA_SHOW_MS
+        rng = self.rng
+        if self.nina_ticks <= 0 and rng.randint(0, 300) == 1:
+            self.nina_x = rng.randint(int(WIDTH*0.25), int(WIDTH*0.75) - CAR_W)
+            self.nina_y = HEIGHT//2 - rng.randint(80, 140)
+            self.nina_ticks = NINA_SHOW_MS * FPS // 1000
+        elif self.nina_ticks > 0:
+            self.nina_ticks -= 1
+
+    def won(self):
+        return self.time_left <= 0
+
+
+class TurboSim(ArcadeSim):
+    """Turbo: samla `needed` turbopaket innan max_hits krockar."""
+
+    def __init__(self, seed=None, needed=10, max_hits=3, speed_px=7, car_speed=7,
+                 spawn_ms=800, pickup_ms=1500, per_spawn=1):
+        super().__init__(seed, max_hits, speed_px, car_speed, spawn_ms, per_spawn)
+        self.needed = needed
+        self.pickup_ms = pickup_ms
+        self.pickups = EntityPool(PICKUP, PICKUP)
+        self.pickup_ticks = 0           # steg sedan senaste turbopaket
+        self.collected = 0
+
+    def spawn(self):
+        self.pickup_ticks += 1
+        if longer_than(self.pickup_ticks, self.pickup_ms):
+            self.pickup_ticks = 0
+            self.pickups.spawn(self.rng.randint(40, WIDTH - 80), -50)
+
+    def update(self):
+        self.collected += self.pickups.advance(self.obstacle_speed, self.car_x, self.car_y,
+                                               CAR_W, CAR_H, HEIGHT + 40)
+
+    def won(self):
+        return self.collected >= self.needed
+
+
+MODES = {"chase": ChaseSim, "turbo": TurboSim}
+SCENE_MODES = {ARCADE_SCENE_KEY: "chase", ARCADE_TURBO_KEY: "turbo"}   # arkadnod -> läge
+
+# =========================
+# Simulated players
+# =========================
+def idle_policy(sim):
+    return False, False
+
+
+def _frames_to_hit(sim, fall, dx, horizon=24):
+    """Frames until the car, steering by dx per frame, would hit an obstacle."""
+    x, car_y = sim.car_x, sim.car_y
+    reach = abs(dx) * horizon
+    # Bara hinder som alls kan nå bilen inom horisonten behöver provas varje frame
+    near = [(ox, oy) for ox, oy in sim.obstacles
+            if car_y - OBSTACLE - fall*horizon < oy < car_y + CAR_H
+            and x - reach - OBSTACLE < ox < x + reach + CAR_W]
+    if not near:
+        return horizon
+    for t in range(1, horizon):
+        x = max(0, min(WIDTH - CAR_W, x + dx))
+        for ox, oy in near:
+            if overlaps(ox, oy + fall*t, OBSTACLE, OBSTACLE, x, car_y, CAR_W, CAR_H):
+                return t
+    return horizon
+
+
+def make_policy(skill=0.8, seed=None):
+    """Simple seeded driver. When an obstacle is closing in it looks a few
+       frames ahead and picks the steering (left, straight, right) that stays
+       clear longest; otherwise it heads for the nearest pickup in turbo mode.
+       `skill` is the chance per frame that it reacts at all."""
+    rng = random.Random(seed)
+
+    def policy(sim):
+        if rng.random() > skill:
+            return False, False
+        fall = sim.obstacle_speed
+        near = any(sim.car_y - 300 < oy < sim.car_y + CAR_H and
+                   ox - CAR_W - 3*sim.car_speed < sim.car_x < ox + OBSTACLE + 3*sim.car_speed
+                   for ox, oy in sim.obstacles)
+        if near:
+            moves = ((0, (False, False)), (-sim.car_speed, (True, False)), (sim.car_speed, (False, True)))
+            return max(moves, key=lambda m: _frames_to_hit(sim, fall, m[0]))[1]
+        targets = getattr(sim, "pickups", ())
+        if targets:
+            px, _ = max(targets, key=lambda p: p[1])
+            dx = px + PICKUP / 2 - (sim.car_x + CAR_W / 2)
+            if abs(dx) > sim.car_speed:
+                return dx < 0, dx > 0
+        return False, False
+    return policy
+
+
+def simulate(sim, policy, max_frames=100_000):
+    """Run `sim` to completion (headless, no frame limit) and return its outcome."""
+    step = sim.step
+    while sim.outcome is None and sim.frame < max_frames:
+        left, right = policy(sim)
+        step(left, right)
+    return sim.outcome
+
+
+def play_steering(sim, steering):
+    """Replay recorded steering ("0".."3" per frame: left = 1, right = 2) into
+       `sim`, stopping at the outcome. Returns the outcome, or None if the
+       input ran out first (the player quit)."""
+    step = sim.step
+    for code in steering:
+        if sim.outcome is not None:
+            break
+        code = ord(code) - 48
+        step(code & 1, code >> 1)
+    return sim.outcome
+
+
+def batch(mode="chase", runs=1000, seed=0, skill=0.8, **params):
+    """Play `runs` seeded games and return outcome counts plus timing."""
+    cls = MODES[mode]
+    counts = {ARCADE_WON: 0, ARCADE_CRASHED: 0, None: 0}
+    frames = 0
+    t0 = time.perf_counter()
+    for i in range(runs):
+        sim = cls(seed=seed + i, **params)
+        counts[simulate(sim, make_policy(skill, seed=seed + i))] += 1
+        frames += sim.frame
+    dt = time.perf_counter() - t0
+    return {"runs": runs, "won": counts[ARCADE_WON], "crashed": counts[ARCADE_CRASHED],
+            "unfinished": counts[None], "success_rate": counts[ARCADE_WON] / runs if runs else 0.0,
+            "frames": frames, "seconds": dt, "runs_per_sec": runs / dt if dt else 0.0}
+
+
+def _param(text):
+    name, _, values = text.partition("=")
+    return name.replace("-", "_"), [int(v) for v in values.split(",")]
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Headless Black Moon arcade balancing runs.")
+    ap.add_argument("mode", choices=sorted(MODES))
+    ap.add_argument("--runs", type=int, default=1000)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--skill", type=float, default=0.8, help="simulated player's reaction chance per frame")
+    ap.add_argument("--set", type=_param, action="append", default=[], metavar="NAME=VALUE",
+                    help="override a rule parameter, e.g. --set obstacle_speed=12")
+    ap.add_argument("--sweep", type=_param, metavar="NAME=V1,V2,...", help="try several values of one parameter")
+    ap.add_argument("--target", type=float, help="success rate to aim for when sweeping")
+    args = ap.parse_args()
+
+    fixed = {name: values[0] for name, values in args.set}
+    name, values = args.sweep if args.sweep else (None, [None])
+    results = []
+    for v in values:
+        params = dict(fixed, **({name: v} if name else {}))
+        r = batch(args.mode, args.runs, args.seed, args.skill, **params)
+        results.append((v, r))
+        label = f"{name}={v:<5} " if name else ""
+        print(f"{label}success {r['success_rate']:6.1%}  won {r['won']}  crashed {r['crashed']}  "
+              f"({r['runs_per_sec']:.0f} runs/s, {r['frames'] / r['seconds']:.0f} frames/s)")
+    if name and args.target is not None:
+        best = min(results, key=lambda vr: abs(vr[1]["success_rate"] - args.target))
+        print(f"closest to target {args.target:.0%}: {name}={best[0]}")
+    sys.exit(0)
@@ -0,0 +1,226 @@
+"""Headless frame-time benchmarks for Black Moon's render paths.
+
+Runs each render path many times under the SDL dummy video driver and
+reports p50/p95/p99 frame times plus the Python heap growth within a frame
+(tracemalloc peak, measured in a separate pass so tracing does not skew the
+timings). Results are compared with a stored baseline; a case that got
+slower or allocates more than the tolerance allows is a regression and
+makes the run exit with status 1.
+
+    python black_moon_bench.py                  # run and compare with bench_baseline.json
+    python black_moon_bench.py --save           # run and store the result as the new baseline
+    python black_moon_bench.py --only arcade --frames 1000
+    python black_moon_bench.py --json
+
+Timings are only comparable on the machine that produced the baseline.
+"""
+import os, sys, json, time, random, argparse, platform, tracemalloc
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")   # inget fönster behövs för att mäta
+
+import pygame
+import black_moon_textadventure as game
+from black_moon_engine import ENDINGS, new_game_state
+from black_moon_arcade import HEIGHT, WIDTH, OBSTACLE
+from black_moon_util import percentile, write_json
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "bench_baseline.json")
+ARCADE_ENTITIES = (0, 32, 128, 512)
+NOISE_MS = 0.05         # skillnader under detta räknas aldrig som regression
+NOISE_KIB = 1.0
+
+
+def _state(scene, **values):
+    state = new_game_state()
+    state["scene"] = scene
+    state.update(values)
+    return state
+
+
+def _post_key():
+    pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_SPACE))
+
+
+# --- Fall: var och en returnerar (uppvärmningsframes, frame(i)) ---
+
+def case_draw_scene(lang):
+    states = [_state(key) for key in game.SCENES if not key.startswith("E_")]
+
+    def frame(i):
+        game.LANG = lang
+        game.draw_scene(states[i % len(states)])
+        pygame.display.flip()
+    return len(states), frame
+
+
+def case_status_bar(changing):
+    states = [_state("S1", health=h, days_left=d) for h in (1, 2, 3) for d in (1, 2, 3)]
+
+    def frame(i):
+        # changing: nya värden varje frame, annars samma (vanliga fallet)
+        rect = game.draw_status_bar(states[i % len(states)] if changing else states[0])
+        pygame.display.update(rect)
+    return len(states), frame
+
+
+def case_end_screen(changing):
+    states = [_state(key) for key in ENDINGS]
+
+    def frame(i):
+        game.END_FADE_MS = 0        # bara den färdiga slutbilden, inte intoningen
+        _post_key()
+        # changing: ett nytt slut varje frame, så att slutbilden komponeras om;
+        # annars samma slut igen (cachad slutbild)
+        game.show_end_and_wait_for_restart(states[i % len(states)] if changing else states[0])
+    return len(states), frame
+
+
+def case_start_screen():
+    path = os.path.join(game.ASSETS_DIR, "start_screen.png")
+
+    def frame(i):
+        _post_key()
+        game.show_start_screen(game.screen, game.clock, path)
+    return 1, frame
+
+
+def case_arcade(entities):
+    view = game.ARCADE_VIEWS[game.ARCADE_SCENE_KEY]
+    # Stillastående hinder och inga nya: samma antal varje frame
+    sim = view.sim_class(seed=1, duration_sec=10**6, obstacle_speed=0, spawn_ms=10**9)
+    rng = random.Random(entities)
+    for _ in range(entities):
+        sim.obstacles.spawn(rng.randrange(0, WIDTH - OBSTACLE), rng.randrange(0, HEIGHT - 300))
+    atlas = game.ARCADE_ATLAS.load()
+    car_img = atlas.get("car")
+    road = view.background()
+
+    def frame(i):
+        sim.step(False, False)
+        game.draw_arcade_frame(sim, view, atlas, road, car_img)
+        pygame.display.flip()
+    return 10, frame
+
+
+def cases():
+    out = {f"draw_scene[{lang}]": (lambda lang=lang: case_draw_scene(lang)) for lang in game.PACK.langs}
+    out["status_bar"] = lambda: case_status_bar(False)
+    out["status_bar[changing]"] = lambda: case_status_bar(True)
+    out["end_screen"] = lambda: case_end_screen(False)
+    out["end_screen[changing]"] = lambda: case_end_screen(True)
+    out["start_screen"] = case_start_screen
+    for n in ARCADE_ENTITIES:
+        out[f"arcade[{n}]"] = lambda n=n: case_arcade(n)
+    return out
+
+
+def measure(make, frames, alloc_frames):
+    warmup, frame = make()
+    for i in range(warmup):
+        frame(i)
+    times = []
+    for i in range(frames):
+        t0 = time.perf_counter_ns()
+        frame(i)
+        times.append(time.perf_counter_ns() - t0)
+    times.sort()
+
+    tracemalloc.start()
+    grown = []
+    for i in range(alloc_frames):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        frame(i)
+        grown.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+    grown.sort()
+
+    return {
+        "p50_ms": round(percentile(times, 0.50) / 1e6, 4),
+        "p95_ms": round(percentile(times, 0.95) / 1e6, 4),
+        "p99_ms": round(percentile(times, 0.99) / 1e6, 4),
+        "alloc_kib": round(percentile(grown, 0.50) / 1024, 2),
+    }
+
+
+def run(frames=300, alloc_frames=60, only=None):
+    if game.screen is None:
+        game.init_display()
+    lang = game.LANG
+    results = {}
+    try:
+        for name, make in cases().items():
+            if only and only not in name:
+                continue
+            results[name] = measure(make, frames, alloc_frames)
+    finally:
+        game.LANG = lang
+    return {
+        "machine": {"python": platform.python_version(), "pygame": pygame.version.ver,
+                    "platform": platform.platform(), "video": os.environ.get("SDL_VIDEODRIVER")},
+        "frames": frames,
+        "cases": results,
+    }
+
+
+def compare(result, baseline, tolerance=0.25):
+    """Regressions of `result` against `baseline`, as readable strings."""
+    regressions = []
+    base_cases = baseline.get("cases", {})
+    for name, r in result["cases"].items():
+        b = base_cases.get(name)
+        if b is None:
+            continue
+        for key in ("p50_ms", "p95_ms"):
+            if r[key] > b[key] * (1 + tolerance) and r[key] - b[key] > NOISE_MS:
+                regressions.append(f"{name}: {key} {r[key]:.3f} ms, baseline {b[key]:.3f} ms")
+        if r["alloc_kib"] > b["alloc_kib"] * (1 + tolerance) + NOISE_KIB:
+            regressions.append(f"{name}: alloc {r['alloc_kib']:.1f} KiB/frame, baseline {b['alloc_kib']:.1f} KiB")
+    return regressions
+
+
+def print_result(result, baseline=None):
+    base_cases = (baseline or {}).get("cases", {})
+    print(f"{'case':22} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'KiB/frame':>10}  baseline p50")
+    for name, r in result["cases"].items():
+        b = base_cases.get(name)
+        ref = f"{b['p50_ms']:.3f} ({r['p50_ms'] / b['p50_ms'] - 1:+.0%})" if b and b["p50_ms"] else ""
+        print(f"{name:22} {r['p50_ms']:8.3f} {r['p95_ms']:8.3f} {r['p99_ms']:8.3f} {r['alloc_kib']:10.1f}  {ref}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Benchmark Black Moon's render paths headless.")
+    ap.add_argument("--frames", type=int, default=300, help="timed frames per case")
+    ap.add_argument("--alloc-frames", type=int, default=60, help="frames traced for allocations")
+    ap.add_argument("--only", help="run only cases whose name contains this text")
+    ap.add_argument("--baseline", default=BASELINE_PATH)
+    ap.add_argument("--save", action="store_true", help="store the result as the new baseline")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown, 0.25 = 25 %%")
+    ap.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = ap.parse_args()
+
+    result = run(args.frames, args.alloc_frames, args.only)
+    try:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    except (OSError, ValueError):
+        baseline = None
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_result(result, baseline)
+
+    if args.save:
+        if baseline and args.only:
+            baseline["cases"].update(result["cases"])
+            result = dict(result, cases=baseline["cases"])
+        write_json(args.baseline, result, indent=2)
+        print(f"baseline saved to {args.baseline}")
+        sys.exit(0)
+    regressions = compare(result, baseline, args.tolerance) if baseline else []
+    for line in regressions:
+        print("REGRESSION:", line)
+    if baseline is None and not args.json:
+        print(f"No baseline at {args.baseline}; run with --save to create one.")
+    sys.exit(1 if regressions else 0)
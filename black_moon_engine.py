@@ -0,0 +1,691 @@
+"""Black Moon story engine: scenes, game state and the rules for stepping
+through them. Pure Python with no pygame dependency, so playthroughs can run
+in CI or on a server without a display.
+
+    state = create_session()
+    list_options(state, "en")      # [(index, label, goto), ...]
+    choose(state, 0)
+
+When a choice leads to an arcade node (state["scene"] is ARCADE_SCENE_KEY or
+ARCADE_TURBO_KEY) the client plays it and reports the result with
+finish_arcade(state, ARCADE_WON / ARCADE_CRASHED / ARCADE_ABORTED).
+
+The rules take either the state dict (the save format) or a GameState,
+which packs into one fixed-width integer for code holding many states.
+"""
+import os
+
+# === Arcade: special scene keys ===
+ARCADE_SCENE_KEY = "__ARCADE__"
+ARCADE_TURBO_KEY = "__ARCADE_TURBO__"
+ARCADE_KEYS = (ARCADE_SCENE_KEY, ARCADE_TURBO_KEY)
+
+# Arcade outcomes reported by the client
+ARCADE_WON = "won"          # chase: survived the clock / turbo: enough pickups
+ARCADE_CRASHED = "crashed"  # max_hits reached
+ARCADE_ABORTED = "aborted"  # ESC
+
+ENDINGS = ("E_GOOD", "E_GREED", "E_COWARD", "E_TIME", "E_DEAD")
+LANGS = ("sv", "en")
+START_SCENE = "S1"          # där new_game_state() börjar; use_story() kan byta den
+
+
+class StoryError(ValueError):
+    """Invalid story data, raised by compile_story() at startup."""
+
+# =========================
+# Game state
+# =========================
+def new_game_state():
+    return {
+        "scene": START_SCENE,
+        "has_disk": True,
+        "disk_hidden": False,
+        "trust_nina": None,
+        "windom_allies": False,
+        "days_left": 3,
+        "health": 3,
+        "suspicion": 0,
+        "solo": False,
+        "killed_henchmen": 0,
+        "ending": None,
+        "return_scene": None,   # <-- NYTT: behövs för Arcade Mode
+    }
+
+# =========================
+# Scenes (bilingual)
+# =========================
+SCENES = {
+    "S1": {
+        "title": {"sv": "Uppdraget", "en": "The Mission"},
+        "image": "scene_01.png",
+        "text": {
+            "sv": "Sam Quint, f.d. tjuv, anlitas av FBI för att stjäla en disk med bevis mot Lucky Dollar i Las Vegas. Kuppen lyckas – men Marvin Ringer är dig i hälarna.",
+            "en": "Sam Quint, a former thief, is hired by the FBI to steal a disk containing evidence against Lucky Dollar in Las Vegas. The heist succeeds—yet Marvin Ringer is right behind you."
+        },
+        "options": [
+            {"label":{"sv":"Stjäl disken och fly genom öknen.","en":"Steal the disk and escape into the desert."}, "goto":"S2"},
+            {"label":{"sv":"Backa ur. Detta är för riskabelt.","en":"Back out. This is too risky."}, "goto":"E_COWARD"}
+        ]
+    },
+    "S2": {
+        "title": {"sv":"Macken i öknen", "en":"Desert Gas Station"},
+        "image": "scene_02.png",
+        "text": {
+            "sv": "Vid en enslig mack korsar du Earl Windom som fraktar prototypen Black Moon. Du behöver gömma disken innan Ringer hinner ifatt.",
+            "en": "At a lonely gas station you cross paths with Earl Windom hauling the Black Moon prototype. You need to hide the disk before Ringer catches up."
+        },
+        "options": [
+            {"label":{"sv":"Göm disken i Black Moons bakre stötfångare.","en":"Hide the disk in Black Moon’s rear bumper."},
+             "goto":"S3", "effects":[{"op":"set","key":"disk_hidden","value":True}]},
+            {"label":{"sv":"Behåll disken på dig och kör mot Los Angeles.","en":"Keep the disk and drive toward Los Angeles."},
+             "goto":"S3B"}
+        ]
+    },
+    "S3": {
+        "title": {"sv":"Los Angeles", "en":"Los Angeles"},
+        "image": "scene_03.png",
+        "text": {
+            "sv": "I L.A. möter du FBI-agent Johnson. Du kräver dubbelt betalt och ett rent pass – Ringer är ett större problem än utlovat.",
+            "en": "In L.A., you meet FBI agent Johnson. You demand double pay and a clean passport—Ringer is a bigger problem than promised."
+        },
+        "options": [
+            {"label":{"sv":"Acceptera hans villkor och fortsätt jobbet.","en":"Accept his terms and continue."}, "goto":"S4"},
+            {"label":{"sv":"Pressa ännu hårdare – det kostar tid.","en":"Push for more—at the cost of time and heat."},
+             "goto":"S4", "effects":[{"op":"inc","key":"days_left","value":-1},{"op":"inc","key":"suspicion","value":1}]}
+        ]
+    },
+    "S3B": {
+        "title": {"sv":"Riskabelt val","en":"Risky Choice"},
+        "image": "scene_03.png",
+        "text": {
+            "sv":"Du bar kvar disken. Ringer nosar upp spår och du ligger efter i tid.",
+            "en":"You kept the disk. Ringer picks up your trail and you lose time."
+        },
+        "options": [
+            {"label":{"sv":"Acceptera Johnsons villkor och fortsätt.","en":"Accept Johnson’s terms and proceed."},
+             "goto":"S4", "effects":[{"op":"inc","key":"suspicion","value":1},{"op":"inc","key":"days_left","value":-1}]}
+        ]
+    },
+ "S4": {
+    "title": {"sv":"Restaurangen","en":"The Restaurant"},
+    "image": "scene_04.png",
+    "text": {
+        "sv":"Windom anländer till en fin restaurang. Du spanar – men Nina och hennes liga stjäl bilarna, inklusive Black Moon, direkt från trailern.",
+        "en":"Windom arrives at a plush restaurant. You stake it out—but Nina’s crew steals every car, including Black Moon right off the trailer."
+    },
+    "options": [
+        {
+            "label": {
+                "sv":"Kasta dig i jakt, följ spåren till ett kontorstorn.",
+                "en":"Dive into a chase, follow the trail to an office tower."
+            },
+            "goto":"S5A",
+            "effects":[{"op":"inc","key":"suspicion","value":1}]
+        },
+        {
+            "label": {
+                "sv":"Spåra metodiskt via kameror och register.",
+                "en":"Track methodically via cameras and records."
+            },
+            "goto":"S5B"
+        },
+        {
+            "label": {
+                "sv": "Jaga efter Nina genom staden (Arcade Mode).",
+                "en": "Chase Nina through the city (Arcade Mode)."
+            },
+            "goto": "__ARCADE__", 
+            "effects": [
+                {"op":"set","key":"return_scene","value":"S5A"}
+            ]
+        }
+    ]
+},
+
+    "S5A": {
+        "title": {"sv":"Garagejakten","en":"The Garage Chase"},
+        "image": "scene_05.png",
+        "text": {
+            "sv":"Du når Ryland Towers men förlorar spåret i garaget. Kameror fångar din siluett.",
+            "en":"You reach Ryland Towers but lose the trail in the garage. Cameras catch your silhouette."
+        },
+        "options": [{"label":{"sv":"Gå vidare.","en":"Continue."}, "goto":"S6"}]
+    },
+    "S5B": {
+        "title": {"sv":"Metodiskt spår","en":"Careful Trail"},
+        "image": "scene_05.png",
+        "text": {
+            "sv":"Spaningen pekar mot Ryland Towers – och Ed Rylands stulna-bilsyndikat.",
+            "en":"The trail points to Ryland Towers—and Ed Ryland’s stolen car syndicate."
+        },
+        "options": [{"label":{"sv":"Gå vidare.","en":"Continue."}, "goto":"S6"}]
+    },
+    "S6": {
+        "title": {"sv":"Tre dagar","en":"Three Days"},
+        "image": "scene_06.png",
+        "text": {
+            "sv":"Johnson varnar: utan disk inom 3 dagar faller målet. Windom vill kontakta polis först.",
+            "en":"Johnson warns: without the disk in 3 days, the case collapses. Windom wants to go to the police first."
+        },
+        "options": [
+            {"label":{"sv":"Be Windom om hjälp – de säger nej (till att börja med).","en":"Ask Windom for help—they refuse at first."}, "goto":"S7"},
+            {"label":{"sv":"Jobba solo och spara tid.","en":"Work solo to save time."}, "goto":"S7", "effects":[{"op":"set","key":"solo","value":True}]}
+        ]
+    },
+    "S7": {
+        "title": {"sv":"Nattklubben","en":"The Nightclub"},
+        "image": "scene_07.png",
+        "text": {
+            "sv":"Du följer Nina till en klubb. Ni klickar – men kan du lita på henne?",
+            "en":"You follow Nina to a club. You connect—but can you trust her?"
+        },
+        "options": [
+            {"label":{"sv":"Visa tillit till Nina.","en":"Trust Nina."}, "goto":"S8", "effects":[{"op":"set","key":"trust_nina","value":True}]},
+            {"label":{"sv":"Håll distans – fokus på bilen.","en":"Keep your distance—focus on the car."}, "goto":"S8", "effects":[{"op":"set","key":"trust_nina","value":False}]}
+        ]
+    },
+    "S8": {
+        "title": {"sv":"Bakhåll","en":"Ambush"},
+        "image": "scene_08.png",
+        "text": {
+            "sv":"Windoms team granskar tornen; en i teamet dödas av Rylands folk. De vänder sig till dig. Ringer hittar dig och anfaller.",
+            "en":"Windom’s team checks the towers; one is killed by Ryland’s men. They turn to you. Ringer finds you and attacks."
+        },
+        "options": [
+            {"label":{"sv":"Fly över taket (du skadas).","en":"Flee over the rooftop (you’re hurt)."},
+             "goto":"S9", "effects":[{"op":"inc","key":"health","value":-1},{"op":"set","key":"windom_allies","value":True}]},
+            {"label":{"sv":"Slå tillbaka (du gör motstånd men blottar dig).","en":"Fight back (you resist but expose yourself)."},
+             "goto":"S9", "effects":[{"op":"inc","key":"health","value":-1},{"op":"inc","key":"killed_henchmen","value":2},{"op":"set","key":"windom_allies","value":True}]}
+        ]
+    },
+    "S9": {
+        "title": {"sv":"Planen","en":"The Plan"},
+        "image": "scene_09.png",
+        "text": {
+            "sv":"Huvudgaraget är ointagligt. Ni bestämmer er för att ta er in via det oavslutade tornet.",
+            "en":"The main garage is impenetrable. You decide to enter via the unfinished tower."
+        },
+        "options": [
+            {"label":{"sv":"Invänta natt (säkrare).","en":"Wait for night (safer)."},
+             "goto":"S10", "effects":[{"op":"inc","key":"days_left","value":-1}]},
+            {"label":{"sv":"Gå direkt (snabbt men riskabelt, kostar tid).","en":"Go now (fast but risky, still costs time)."},
+             "goto":"S10", "effects":[{"op":"inc","key":"days_left","value":-1}]}
+        ]
+    },
+    "S10": {
+        "title": {"sv":"Ventilationsschaktet","en":"The Vent Shaft"},
+        "image": "scene_10.png",
+        "text": {
+            "sv":"Du klättrar ned i schaktet – och hittar Nina inspärrad. Ryland misstänker henne.",
+            "en":"You climb down the shaft—and find Nina locked up. Ryland suspects her."
+        },
+        "options": [
+            {"label":{"sv":"Rädda Nina. Två är bättre än en.","en":"Rescue Nina. Two are better than one."},
+             "goto":"S11", "effects":[{"op":"set","key":"trust_nina","value":True}]},
+            {"label":{"sv":"Lämna henne. Tiden är knapp.","en":"Leave her. Time is critical."}, "goto":"S11B"}
+        ]
+    },
+  "S11": {
+    "title": {"sv":"Chop shop-kuppen","en":"Chop Shop Heist"},
+    "image": "scene_11.png",
+    "text": {
+        "sv":"I stulna uniformer rullar ni ut Black Moon. Windom spränger porten men nödgaller faller. Ni kör in i lasthissen mot Rylands våningsplan.",
+        "en":"In stolen uniforms you roll out Black Moon. Windom blows the door but emergency bars drop. You drive into the freight elevator toward Ryland’s floor."
+    },
+    "options": [
+        {
+            "label": {
+                "sv": "Aktivera turbon och samla kraft för att flyga genom fönstret (Arcade Mode).",
+                "en": "Activate turbo and gather power to fly through the window (Arcade Mode)."
+            },
+            "goto": "__ARCADE_TURBO__",
+            "effects": [
+                {"op": "set", "key": "return_scene", "value": "S12"}
+            ]
+        }
+    ]
+},
+
+    "S11B": {
+        "title": {"sv":"Solo i kaoset","en":"Solo in the Chaos"},
+        "image": "scene_11.png",
+        "text": {
+            "sv":"Du kör ensam. Utan Ninas hjälp blir reträtten rörigare och du skadas.",
+            "en":"You drive solo. Without Nina’s help the retreat is messier and you’re hurt."
+        },
+        "options": [{"label":{"sv":"Aktivera turbon – rakt mot fönstret!","en":"Hit turbo—straight at the window!"},
+                     "goto":"S12", "effects":[{"op":"inc","key":"health","value":-1}]}]
+    },
+    "S12": {
+        "title": {"sv":"Genom glaset","en":"Through the Glass"},
+        "image": "scene_11.png",
+        "text": {
+            "sv":"Black Moon skjuter fram – Ryland mejas, bilen flyger in i det tomma tornet. Du får ut disken...",
+            "en":"Black Moon surges—Ryland is struck, the car leaps into the empty tower. You retrieve the disk..."
+        },
+        "options": [{"label":{"sv":"Möt Ringer: slåss om disken.","en":"Face Ringer: fight for the disk."}, "goto":"S13"}]
+    },
+    "S13": {
+        "title": {"sv":"Final","en":"Finale"},
+        "image": "scene_12.png",
+        "text": {
+            "sv":"Ringer dyker upp för att hämta disken. Johnson närmar sig. Allt avgörs nu.",
+            "en":"Ringer arrives to seize the disk. Johnson closes in. Everything is decided now."
+        },
+        "options": [
+            {"label":{"sv":"Ge disken till Johnson och dra dig tillbaka.","en":"Give the disk to Johnson and walk away."}, "goto":"E_GOOD"},
+            {"label":{"sv":"Behåll disken – sälj den själv.","en":"Keep the disk—sell it yourself."}, "goto":"E_GREED"},
+        ]
+    },
+
+    # Endings
+    "E_COWARD": {
+        "title":{"sv":"Game Over","en":"Game Over"},
+        "image":"scene_03.png",
+        "text":{"sv":"Du backade ur. Lucky Dollar går fria.","en":"You backed out. Lucky Dollar walks free."},
+        "options":[]
+    },
+    "E_TIME": {
+        "title":{"sv":"För sent","en":"Too Late"},
+        "image":"scene_06.png",
+        "text":{"sv":"Tre dagar gick. Fallet faller i domstol.","en":"Three days passed. The case collapses in court."},
+        "options":[]
+    },
+    "E_DEAD": {
+        "title":{"sv":"Skadad till fall","en":"Down and Out"},
+        "image":"scene_08.png",
+        "text":{"sv":"Skadorna blir för svåra.","en":"Your injuries are too severe."},
+        "options":[]
+    },
+    "E_GOOD": {
+        "title":{"sv":"You Win!","en":"You Win!"},
+        "image":"scene_12.png",
+        "text":{"sv":"Du lämnar disken till Johnson. Pensionen väntar.","en":"You hand the disk to Johnson. Retirement awaits."},
+        "options":[]
+    },
+    "E_GREED": {
+        "title":{"sv":"Girighetens pris","en":"Price of Greed"},
+        "image":"scene_12.png",
+        "text":{"sv":"Du försöker sälja disken. Ringer jagar dig för evigt.","en":"You try to sell the disk. Ringer hunts you forever."},
+        "options":[]
+    }
+}
+
+# =========================
+# Rules
+# =========================
+def apply_effects(state, effects):
+    for e in effects or []:
+        op, key, val = e.get("op"), e.get("key"), e.get("value")
+        if op == "set":
+            state[key] = val
+        elif op == "inc":
+            state[key] = state.get(key, 0) + val
+    return check_state(state)
+
+def check_state(state):
+    """Health and time limits, checked after every scene change."""
+    if state["health"] <= 0:
+        state["scene"] = "E_DEAD"
+    if state["days_left"] <= 0 and not state["scene"].startswith("E_"):
+        state["scene"] = "E_TIME"
+    return state
+
+def is_ending(state):
+    return state["scene"].startswith("E_")
+
+def step_scene(state, choice_index):
+    return STORY.step(state, choice_index)
+
+def finish_arcade(state, outcome):
+    """Apply the result of the arcade sequence in state["scene"]."""
+    if state["scene"] == ARCADE_SCENE_KEY:
+        # Biljakten: krock kostar hälsa, annars tillbaka till berättelsen
+        if outcome == ARCADE_CRASHED:
+            state["health"] = max(0, state["health"] - 1)
+        state["scene"] = state.get("return_scene") or "S5A"
+        state["return_scene"] = None
+    elif state["scene"] == ARCADE_TURBO_KEY:
+        # Turbo: avbrott betyder att sekvensen körs om
+        if outcome == ARCADE_CRASHED:
+            state["health"] = max(0, state["health"] - 1)
+            state["scene"] = "E_DEAD"
+            state["return_scene"] = None
+        elif outcome == ARCADE_WON:
+            state["scene"] = state.get("return_scene") or "S11"
+            state["return_scene"] = None
+    return check_state(state)
+
+def scene_successors(key):
+    """Scenes that can be shown right after `key`: every option's goto, with
+       arcade nodes replaced by their return scene and possible death/timeout."""
+    out = []
+    for opt in SCENES.get(key, {}).get("options", []):
+        goto = opt.get("goto")
+        effects = opt.get("effects") or []
+        if goto in ARCADE_KEYS:
+            ret = next((e["value"] for e in effects if e.get("key") == "return_scene"), None)
+            out.append(ret or ("S5A" if goto == ARCADE_SCENE_KEY else "S11"))
+            out.append("E_DEAD")  # krock i arkaden kostar hälsa
+        else:
+            out.append(goto)
+        for e in effects:
+            if e.get("op") == "inc" and e.get("value", 0) < 0:
+                if e.get("key") == "health": out.append("E_DEAD")
+                elif e.get("key") == "days_left": out.append("E_TIME")
+    return [k for k in dict.fromkeys(out) if k in SCENES]
+
+# =========================
+# Compiled story
+# =========================
+class CompiledStory:
+    """Array-backed scene table built once by compile_story(). Scene ids are
+       positions in `keys` (the arcade nodes get the last ids); per option,
+       `gotos` holds the target id and `effects` a precompiled callable."""
+
+    def __init__(self, keys, gotos, effects, images):
+        self.keys = keys
+        self.index = {k: i for i, k in enumerate(keys)}
+        self.gotos = gotos          # id -> tuple of target ids, one per option
+        self.effects = effects      # id -> tuple of callables(state), one per option
+        self.images = images        # id -> image filename (None for arcade nodes)
+        self.endings = [k.startswith("E_") for k in keys]
+
+    def step(self, state, choice_index):
+        sid = self.index[state["scene"]]
+        gotos = self.gotos[sid]
+        if choice_index < 0 or choice_index >= len(gotos):
+            return state
+
+        # Tillämpa eventuella effekter
+        self.effects[sid][choice_index](state)
+
+        goto = self.keys[gotos[choice_index]]
+
+        # Special: arcade. Klienten spelar den och rapporterar via finish_arcade()
+        if goto == ARCADE_SCENE_KEY and not state.get("return_scene"):
+            # Om return_scene inte redan sattes via effects, defaulta till S5A
+            state["return_scene"] = "S5A"
+
+        # Normal scenväxling (även slut och arkad)
+        state["scene"] = goto
+        return state
+
+    def choose(self, state, choice_index):
+        self.step(state, choice_index)
+        if state["scene"] not in ARCADE_KEYS:
+            check_state(state)
+        return state
+
+
+def _compile_effects(effects):
+    """Turn an effects list into one callable with the same result as apply_effects()."""
+    ops = tuple((e["op"] == "inc", e["key"], e["value"]) for e in effects or ())
+
+    def run(state):
+        for inc, key, val in ops:
+            state[key] = state.get(key, 0) + val if inc else val
+        check_state(state)
+    return run
+
+
+_SCENE_FIELDS = ("scene", "ending", "return_scene")
+
+
+def _set_error(key, val, default, scenes):
+    """Why `set key val` would break the state, or None. The type follows
+       new_game_state(): ints stay ints, flags stay bools, trust_nina is
+       None or a bool and the scene fields name a scene (or None)."""
+    if key in _SCENE_FIELDS:
+        if val is None and key != "scene":
+            return None
+        return None if val in scenes else f"unknown {key} {val!r}"
+    if default is None:
+        ok = val is None or isinstance(val, bool)
+    elif isinstance(default, bool):
+        ok = isinstance(val, bool)
+    else:
+        ok = isinstance(val, int) and not isinstance(val, bool)
+    return None if ok else f"set {key} to {type(val).__name__} {val!r}"
+
+
+def _story_errors(scenes, langs):
+    defaults = new_game_state()
+    fields = set(defaults)
+    errors = []
+    for key, sc in scenes.items():
+        for field in ("title", "text"):
+            for lang in langs:
+                if not isinstance(sc.get(field, {}).get(lang), str):
+                    errors.append(f"{key}: missing {field}[{lang!r}]")
+        if not isinstance(sc.get("image"), str) or not sc["image"]:
+            errors.append(f"{key}: missing image")
+        for n, opt in enumerate(sc.get("options", []), start=1):
+            where = f"{key} option {n}"
+            for lang in langs:
+                if not isinstance(opt.get("label", {}).get(lang), str):
+                    errors.append(f"{where}: missing label[{lang!r}]")
+            goto = opt.get("goto", key)
+            if goto not in scenes and goto not in ARCADE_KEYS:
+                errors.append(f"{where}: unknown goto {goto!r}")
+            for e in opt.get("effects") or []:
+                op, ekey, val = e.get("op"), e.get("key"), e.get("value")
+                if op not in ("set", "inc"):
+                    errors.append(f"{where}: unknown effect op {op!r}")
+                elif ekey not in fields:
+                    errors.append(f"{where}: unknown state key {ekey!r}")
+                elif op == "inc":
+                    if type(defaults[ekey]) is not int:
+                        errors.append(f"{where}: inc non-counter {ekey}")
+                    elif not isinstance(val, int):
+                        errors.append(f"{where}: inc {ekey} by non-integer {val!r}")
+                else:
+                    problem = _set_error(ekey, val, defaults[ekey], scenes)
+                    if problem:
+                        errors.append(f"{where}: {problem}")
+    return errors
+
+
+def compile_story(scenes, langs=LANGS):
+    """Validate `scenes` and build a CompiledStory. Raises StoryError listing
+       every problem, so bad data fails at startup instead of mid-game."""
+    errors = _story_errors(scenes, langs)
+    if errors:
+        raise StoryError("Invalid story data:\n  " + "\n  ".join(errors))
+    keys = list(scenes) + [k for k in ARCADE_KEYS if k not in scenes]
+    index = {k: i for i, k in enumerate(keys)}
+    gotos, effects, images = [], [], []
+    for key in keys:
+        opts = scenes[key].get("options", []) if key in scenes else []
+        gotos.append(tuple(index[opt.get("goto", key)] for opt in opts))
+        effects.append(tuple(_compile_effects(opt.get("effects")) for opt in opts))
+        images.append(scenes[key]["image"] if key in scenes else None)
+    return CompiledStory(keys, gotos, effects, images)
+
+
+def missing_images(story, assets_dir):
+    """Image files referenced by the story that are not in assets_dir."""
+    return sorted({img for img in story.images
+                   if img and not os.path.exists(os.path.join(assets_dir, img))})
+
+
+STORY = compile_story(SCENES)
+
+
+def use_story(scenes, langs=(), start=None):
+    """Make `scenes` the story played by the rules and the session API, e.g.
+       the structure of an external story pack, with new games starting at
+       `start` (default: unchanged). Only the languages in `langs` are
+       validated, so scenes without their text are accepted."""
+    global SCENES, STORY, START_SCENE
+    story = compile_story(scenes, langs)
+    start = START_SCENE if start is None else start
+    if start not in scenes:
+        raise StoryError(f"Invalid story data:\n  unknown start scene {start!r}")
+    SCENES, STORY, START_SCENE = scenes, story, start
+    return story
+
+# =========================
+# Compact state
+# =========================
+FIELDS = tuple(new_game_state())
+_FIELD_SET = frozenset(FIELDS)
+SCENE_BITS = 16
+SCENE_MASK = (1 << SCENE_BITS) - 1
+PACKED_BYTES = 11           # 86 bitar, se GameState.pack()
+_TRI = {None: 0, False: 1, True: 2}
+_TRI_VALUES = (None, False, True)
+# (fält, bitposition) för heltalen; 8 bitar med tecken räcker för alla räknare
+_SMALL_INTS = (("days_left", 54), ("health", 62), ("suspicion", 70), ("killed_henchmen", 78))
+
+
+class GameState:
+    """The game state in slots instead of a dict. It supports the item
+       access the rules use (state["health"], state.get(...)), so
+       choose() and finish_arcade() work on it directly. pack() turns it
+       into one fixed-width integer, valid for the story it was packed
+       with. to_dict()/from_dict() convert to and from the JSON save format.
+
+       A GameState hashes by value. Don't change one while it is a key in a
+       set or dict."""
+    __slots__ = FIELDS
+
+    @classmethod
+    def new(cls):
+        return cls.from_dict(new_game_state())
+
+    @classmethod
+    def from_dict(cls, state):
+        if not isinstance(state, dict) or set(state) != _FIELD_SET:
+            raise ValueError(f"not a game state: {state!r}")
+        s = cls.__new__(cls)
+        for k in FIELDS:
+            setattr(s, k, state[k])
+        return s
+
+    def to_dict(self):
+        return {k: getattr(self, k) for k in FIELDS}
+
+    def _values(self):
+        return (self.scene, self.has_disk, self.disk_hidden, self.trust_nina, self.windom_allies,
+                self.days_left, self.health, self.suspicion, self.solo, self.killed_henchmen,
+                self.ending, self.return_scene)
+
+    def copy(self):
+        c = GameState.__new__(GameState)
+        (c.scene, c.has_disk, c.disk_hidden, c.trust_nina, c.windom_allies, c.days_left, c.health,
+         c.suspicion, c.solo, c.killed_henchmen, c.ending, c.return_scene) = self._values()
+        return c
+
+    # --- Samma åtkomst som dict-tillståndet ---
+    def __getitem__(self, key):
+        if key not in _FIELD_SET:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in _FIELD_SET:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in _FIELD_SET else default
+
+    def __contains__(self, key):
+        return key in _FIELD_SET
+
+    def __iter__(self):
+        return iter(FIELDS)
+
+    def __len__(self):
+        return len(FIELDS)
+
+    def keys(self):
+        return FIELDS
+
+    def __eq__(self, other):
+        if not isinstance(other, GameState):
+            return NotImplemented
+        return self._values() == other._values()
+
+    def __hash__(self):
+        return hash(self._values())
+
+    def __repr__(self):
+        return f"GameState({self.to_dict()!r})"
+
+    # --- Packning ---
+    def pack(self, story=None):
+        """The state as one integer of PACKED_BYTES * 8 bits. From the least
+           significant bit: scene id, return_scene and ending (16 bits each,
+           ids + 1 with 0 for None), has_disk, disk_hidden, windom_allies,
+           solo (1 bit each), trust_nina (2 bits: None, False, True) and
+           days_left, health, suspicion, killed_henchmen (8-bit signed)."""
+        index = (story or STORY).index
+        if len(index) > SCENE_MASK:
+            raise ValueError(f"{len(index)} scenes do not fit in {SCENE_BITS} bits")
+        try:
+            n = (index[self.scene]
+                 | (0 if self.return_scene is None else index[self.return_scene] + 1) << 16
+                 | (0 if self.ending is None else index[self.ending] + 1) << 32
+                 | bool(self.has_disk) << 48 | bool(self.disk_hidden) << 49
+                 | bool(self.windom_allies) << 50 | bool(self.solo) << 51
+                 | _TRI[self.trust_nina] << 52)
+        except KeyError as e:
+            raise ValueError(f"cannot pack {e.args[0]!r}") from None
+        for key, shift in _SMALL_INTS:
+            v = getattr(self, key)
+            if not -128 <= v < 128:
+                raise ValueError(f"{key}={v} does not fit in 8 bits")
+            n |= (v & 0xFF) << shift
+        return n
+
+    @classmethod
+    def unpack(cls, n, story=None):
+        keys = (story or STORY).keys
+        s = cls.__new__(cls)
+        s.scene = keys[n & SCENE_MASK]
+        r, e = n >> 16 & SCENE_MASK, n >> 32 & SCENE_MASK
+        s.return_scene = keys[r - 1] if r else None
+        s.ending = keys[e - 1] if e else None
+        s.has_disk = bool(n >> 48 & 1)
+        s.disk_hidden = bool(n >> 49 & 1)
+        s.windom_allies = bool(n >> 50 & 1)
+        s.solo = bool(n >> 51 & 1)
+        s.trust_nina = _TRI_VALUES[n >> 52 & 3]
+        for key, shift in _SMALL_INTS:
+            setattr(s, key, ((n >> shift & 0xFF) ^ 0x80) - 0x80)
+        return s
+
+    def to_bytes(self, story=None):
+        return self.pack(story).to_bytes(PACKED_BYTES, "little")
+
+    @classmethod
+    def from_bytes(cls, data, story=None):
+        return cls.unpack(int.from_bytes(data, "little"), story)
+
+
+def packed_scene(n, story=None):
+    """Scene key of a packed state, without unpacking the rest."""
+    return (story or STORY).keys[n & SCENE_MASK]
+
+# =========================
+# Session API
+# =========================
+def create_session(state=None):
+    """Start a playthrough, or resume one from a saved state dict."""
+    return dict(state) if state else new_game_state()
+
+def list_options(state, lang="sv"):
+    """[(index, label, goto)] for the current scene. Empty in endings and
+       while an arcade sequence is pending. label is None when the story was
+       loaded from a pack (use_story); the pack holds the text."""
+    sc = SCENES.get(state["scene"])
+    if sc is None:
+        return []
+    return [(i, opt.get("label", {}).get(lang), opt.get("goto")) for i, opt in enumerate(sc.get("options", []))]
+
+def choose(state, choice_index):
+    """Apply option `choice_index` of the current scene and return the state."""
+    return STORY.choose(state, choice_index)
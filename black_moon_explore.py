@@ -0,0 +1,191 @@
+"""Exhaustive story-state explorer for Black Moon.
+
+Walks every reachable (scene, game state) combination from new_game_state()
+breadth-first through the engine's own rules, merging identical states, and
+treats arcade nodes as branches with every possible outcome. Reports which
+endings are reachable (with the shortest choice path to each), unreachable
+scenes, dead ends and options that can never take effect. The story is
+validated by engine.compile_story() first, so broken data fails up front.
+
+    python black_moon_explore.py            # human-readable report
+    python black_moon_explore.py --json
+    python black_moon_explore.py --strict   # exit 1 if any problem is found (CI)
+"""
+import sys, json, argparse
+from array import array
+from collections import deque
+
+import black_moon_engine as engine
+from black_moon_engine import GameState
+
+ARCADE_OUTCOMES = (engine.ARCADE_WON, engine.ARCADE_CRASHED, engine.ARCADE_ABORTED)
+
+
+def _action_code(action):
+    # >= 0: valt alternativ, < 0: arkadutfall (-1 = ARCADE_OUTCOMES[0] ...)
+    return action if isinstance(action, int) else -1 - ARCADE_OUTCOMES.index(action)
+
+
+def _action(code):
+    return code if code >= 0 else ARCADE_OUTCOMES[-1 - code]
+
+
+def explore(scenes=None, start=None, max_states=5_000_000):
+    """Breadth-first search over the state graph. States are interned packed
+       (GameState.pack(), one small int each) and referred to by integer id;
+       parent links, actions and edges live in flat arrays so the search
+       stays compact."""
+    scenes = engine.SCENES if scenes is None else scenes
+    story = engine.STORY if scenes is engine.SCENES else engine.compile_story(scenes)
+    start = GameState.from_dict(engine.new_game_state() if start is None else start)
+    keys = story.keys
+
+    ids = {}                        # packat tillstånd -> id
+    states = []                     # id -> packat tillstånd
+    parent = array("l")             # id -> parent id (-1 for start)
+    via = array("l")                # id -> action code that reached it
+    edge_src, edge_dst = array("l"), array("l")
+    taken = {}                      # (scene, option) -> set of goto scenes actually reached
+
+    def intern(code, from_id, action):
+        sid = ids.get(code)
+        if sid is None:
+            sid = ids[code] = len(states)
+            states.append(code)
+            parent.append(from_id)
+            via.append(action)
+            queue.append(sid)
+        if from_id >= 0:
+            edge_src.append(from_id)
+            edge_dst.append(sid)
+        return sid
+
+    queue = deque()
+    intern(start.pack(story), -1, 0)
+    while queue:
+        if len(states) > max_states:
+            raise RuntimeError(f"more than {max_states} states; raise max_states")
+        sid = queue.popleft()
+        code = states[sid]
+        sidx = code & engine.SCENE_MASK
+        scene = keys[sidx]
+        if story.endings[sidx]:
+            continue
+        state = GameState.unpack(code, story)
+        if scene in engine.ARCADE_KEYS:
+            for outcome in ARCADE_OUTCOMES:
+                nxt = engine.finish_arcade(state.copy(), outcome)
+                intern(nxt.pack(story), sid, _action_code(outcome))
+            continue
+        for i in range(len(story.gotos[sidx])):
+            nxt = story.choose(state.copy(), i)
+            taken.setdefault((scene, i), set()).add(nxt.scene)
+            intern(nxt.pack(story), sid, i)
+
+    return _report(scenes, story, states, parent, via, edge_src, edge_dst, taken)
+
+
+def _path(sid, states, parent, via, story):
+    steps = []
+    while parent[sid] >= 0:
+        scene = engine.packed_scene(states[parent[sid]], story)
+        steps.append((scene, _action(via[sid])))
+        sid = parent[sid]
+    return steps[::-1]
+
+
+def _report(scenes, story, states, parent, via, edge_src, edge_dst, taken):
+    scene_of = [engine.packed_scene(code, story) for code in states]
+    seen_scenes = {}
+    for sid, scene in enumerate(scene_of):
+        seen_scenes.setdefault(scene, sid)  # BFS: första träffen är kortaste vägen
+
+    # Bakåtsökning: vilka tillstånd kan alls nå ett slut?
+    rev = [[] for _ in states]
+    for a, b in zip(edge_src, edge_dst):
+        rev[b].append(a)
+    can_end = bytearray(len(states))
+    queue = deque(sid for sid, scene in enumerate(scene_of) if scene.startswith("E_"))
+    for sid in queue:
+        can_end[sid] = 1
+    while queue:
+        for p in rev[queue.popleft()]:
+            if not can_end[p]:
+                can_end[p] = 1
+                queue.append(p)
+
+    endings = {}
+    for scene, sid in seen_scenes.items():
+        if scene.startswith("E_"):
+            endings[scene] = _path(sid, states, parent, via, story)
+
+    stuck = {}
+    for sid, scene in enumerate(scene_of):
+        if not can_end[sid]:
+            stuck.setdefault(scene, sid)
+
+    ineffective, unselectable = [], []
+    for key, sc in scenes.items():
+        for i, opt in enumerate(sc.get("options", [])):
+            goto = opt.get("goto", key)
+            if key not in seen_scenes:
+                unselectable.append((key, i))
+            elif goto not in taken.get((key, i), ()):
+                ineffective.append((key, i, goto, sorted(taken.get((key, i), ()))))
+
+    return {
+        "states": len(states),
+        "scenes_reached": len([s for s in seen_scenes if s in scenes]),
+        "endings": endings,
+        "unreached_endings": sorted(k for k in scenes if k.startswith("E_") and k not in endings),
+        # Slut räknas bara under unreached_endings
+        "unreachable_scenes": sorted(k for k in scenes if k not in seen_scenes and not k.startswith("E_")),
+        "dead_scenes": sorted(k for k in seen_scenes
+                              if k in scenes and not k.startswith("E_") and not scenes[k].get("options")),
+        "stuck_scenes": sorted(stuck),
+        "unselectable_options": unselectable,
+        "ineffective_options": ineffective,
+    }
+
+
+def problems(report):
+    """True if the story has a defect. Unreached endings (E_TIME in the
+       shipped story) are listed in the report but do not fail --strict."""
+    return any(report[k] for k in ("unreachable_scenes", "dead_scenes", "stuck_scenes",
+                                   "unselectable_options", "ineffective_options"))
+
+
+def print_report(report):
+    print(f"{report['states']} distinct states, {report['scenes_reached']} scenes reached")
+    print("\nReachable endings (shortest path):")
+    for ending, path in sorted(report["endings"].items(), key=lambda kv: len(kv[1])):
+        steps = " -> ".join(f"{scene}[{a + 1 if isinstance(a, int) else a}]" for scene, a in path)
+        print(f"  {ending:9} {len(path):3} steps  {steps}")
+    if report["unreached_endings"]:
+        print("Unreachable endings:", ", ".join(report["unreached_endings"]))
+    for title, key in (("Unreachable scenes", "unreachable_scenes"),
+                       ("Dead scenes (no options, not an ending)", "dead_scenes"),
+                       ("Scenes with states that can never reach an ending", "stuck_scenes")):
+        if report[key]:
+            print(f"\n{title}: {', '.join(report[key])}")
+    for scene, i in report["unselectable_options"]:
+        print(f"Unselectable option (scene never reached): {scene} option {i + 1}")
+    for scene, i, goto, actual in report["ineffective_options"]:
+        print(f"Option never reaches its goto: {scene} option {i + 1} -> {goto} (leads to {', '.join(actual)})")
+    if not problems(report):
+        print("\nNo problems found.")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Explore every reachable Black Moon story state.")
+    ap.add_argument("--json", action="store_true", help="print the report as JSON")
+    ap.add_argument("--strict", action="store_true", help="exit with status 1 if problems are found")
+    ap.add_argument("--max-states", type=int, default=5_000_000)
+    args = ap.parse_args()
+    report = explore(max_states=args.max_states)
+    if args.json:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        print()
+    else:
+        print_report(report)
+    sys.exit(1 if args.strict and problems(report) else 0)
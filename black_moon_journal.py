@@ -0,0 +1,230 @@
+"""Append-only save journal for Black Moon.
+
+Every choice and arcade result is appended to the active slot's journal as
+one short JSON line, with a full snapshot of the state every SNAPSHOT_EVERY
+events. A manual save is a one-line marker, so saving costs the same no
+matter how far into the story the player is. Loading finds the last marker,
+starts from the nearest snapshot before it and replays the few events in
+between through the engine's own rules.
+
+Writes go through one background thread, so the game loop never waits on the
+disk. Every record is flushed and fsynced as it is written; a line torn by a
+crash is simply ignored on load. When a journal grows past COMPACT_BYTES the
+writer rewrites it to three records (save point, marker, current state) in a
+temporary file and renames it into place atomically.
+
+    python black_moon_journal.py saves/slot1.journal   # print saved and latest state
+"""
+import os, sys, json, queue, threading
+
+import black_moon_engine as engine
+from black_moon_util import json_line, write_atomic
+
+SNAPSHOT_EVERY = 32         # events between full snapshots
+COMPACT_BYTES = 64 * 1024   # journal size that triggers a rewrite
+
+# Record kinds: {"snap": state}, {"c": option index}, {"a": arcade outcome}, {"save": 1}
+
+
+def _line(record):
+    return json_line(record).encode("utf-8")
+
+
+def read_records(path):
+    """Records of a journal in order. Reading stops at the first line that is
+       incomplete or unreadable, i.e. the one a crash interrupted."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return []
+    records = []
+    for raw in data.split(b"\n")[:-1]:   # det som följer sista radslutet är ofullständigt
+        try:
+            records.append(json.loads(raw))
+        except ValueError:
+            break
+    return records
+
+
+def replay(records, end=None):
+    """State after records[:end], or None if no snapshot precedes `end`."""
+    end = len(records) if end is None else end
+    start = next((i for i in range(end - 1, -1, -1) if "snap" in records[i]), None)
+    if start is None:
+        return None
+    state = dict(records[start]["snap"])
+    for rec in records[start + 1:end]:
+        if "c" in rec:
+            engine.choose(state, rec["c"])
+        elif "a" in rec:
+            engine.finish_arcade(state, rec["a"])
+    return state
+
+
+def saved_state(records):
+    """State at the last save marker, or None if the journal has none."""
+    mark = next((i for i in range(len(records) - 1, -1, -1) if "save" in records[i]), None)
+    return None if mark is None else replay(records, mark)
+
+
+def compact(path):
+    """Rewrite a journal as [snapshot at last save, save marker, current
+       snapshot] and atomically replace the old file."""
+    records = read_records(path)
+    current = replay(records)
+    saved = saved_state(records)
+    out = []
+    if saved is not None:
+        out += [{"snap": saved}, {"save": 1}]
+    if current is not None:
+        out.append({"snap": current})
+    write_atomic(path, b"".join(_line(r) for r in out), fsync=True)
+
+
+def _trim_torn_tail(path):
+    """Cut a final line left incomplete by a crash, so new records start on a
+       line of their own."""
+    try:
+        with open(path, "r+b") as f:
+            data = f.read()   # journaler komprimeras vid COMPACT_BYTES, så de är små
+            if data and not data.endswith(b"\n"):
+                f.truncate(data.rfind(b"\n") + 1)
+    except FileNotFoundError:
+        pass
+
+
+class JournalWriter:
+    """Background thread that owns every journal file handle. append() only
+       queues bytes; the thread, started on first use, writes, fsyncs and
+       compacts."""
+
+    def __init__(self, compact_bytes=COMPACT_BYTES):
+        self.compact_bytes = compact_bytes
+        self._queue = queue.Queue()
+        self._files = {}   # sökväg -> öppen fil
+        self._thread = None
+        self.errors = 0
+
+    def append(self, path, data):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="journal-writer", daemon=True)
+            self._thread.start()
+        self._queue.put((path, data))
+
+    def flush(self):
+        """Block until everything queued so far is on disk."""
+        self._queue.join()
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    for f in self._files.values():
+                        f.close()
+                    self._files.clear()
+                    return
+                self._write(*item)
+            except OSError as e:
+                self.errors += 1
+                print("Save error:", e)
+            finally:
+                self._queue.task_done()
+
+    def _write(self, path, data):
+        f = self._files.get(path)
+        if f is None:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            _trim_torn_tail(path)
+            f = self._files[path] = open(path, "ab")
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+        if f.tell() > self.compact_bytes:
+            f.close()
+            del self._files[path]
+            compact(path)
+
+
+class SaveJournal:
+    """One save slot: the event journal of the game being played in it."""
+
+    def __init__(self, path, writer, snapshot_every=SNAPSHOT_EVERY):
+        self.path = path
+        self.writer = writer
+        self.snapshot_every = snapshot_every
+        self._since_snapshot = 0
+
+    def _append(self, record):
+        self.writer.append(self.path, _line(record))
+
+    def start(self, state):
+        """Begin a new stretch of events from `state` (new game, load, slot switch)."""
+        self._append({"snap": state})
+        self._since_snapshot = 0
+
+    def _event(self, record, state):
+        self._append(record)
+        self._since_snapshot += 1
+        if self._since_snapshot >= self.snapshot_every:
+            self.start(state)
+
+    def choice(self, index, state):
+        """Record option `index`; `state` is the state after it was applied."""
+        self._event({"c": index}, state)
+
+    def arcade(self, outcome, state):
+        self._event({"a": outcome}, state)
+
+    def save(self):
+        self._append({"save": 1})
+
+    def load(self):
+        """State at the last manual save, or None."""
+        self.writer.flush()
+        return saved_state(read_records(self.path))
+
+    def latest(self):
+        """State after the last recorded event (the autosave), or None."""
+        self.writer.flush()
+        return replay(read_records(self.path))
+
+
+class SaveSlots:
+    """Numbered save slots sharing one writer thread; one of them is active."""
+
+    def __init__(self, save_dir, count=3, writer=None):
+        self.save_dir = save_dir
+        self.writer = writer or JournalWriter()
+        self.journals = [SaveJournal(os.path.join(save_dir, f"slot{n}.journal"), self.writer)
+                         for n in range(1, count + 1)]
+        self.slot = 1
+
+    @property
+    def active(self):
+        return self.journals[self.slot - 1]
+
+    def select(self, slot, state):
+        """Make `slot` active; its journal continues from the current state."""
+        if 1 <= slot <= len(self.journals) and slot != self.slot:
+            self.slot = slot
+            self.active.start(state)
+
+    def close(self):
+        self.writer.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("usage: python black_moon_journal.py <journal file>")
+    records = read_records(sys.argv[1])
+    print(f"{len(records)} records, {sum('snap' in r for r in records)} snapshots")
+    print("saved: ", json.dumps(saved_state(records), ensure_ascii=False))
+    print("latest:", json.dumps(replay(records), ensure_ascii=False))
@@ -0,0 +1,307 @@
+"""Monte Carlo ending analysis for Black Moon.
+
+Plays many randomized playthroughs of the story on a process pool and
+reports how often each ending is reached, the distribution of days_left,
+health and suspicion in every scene, and how those shift when an arcade
+difficulty parameter changes. Story choices come from a seeded policy;
+arcade nodes are played with the real arcade rules by the seeded simulated
+driver from black_moon_arcade, so difficulty changes propagate exactly as
+in the game.
+
+Every playthrough has its own seed, derived from --seed and its run number,
+so the result depends only on those and not on how runs are split into
+chunks or spread over workers. Each worker returns a Tally of counts for
+its chunk, which the parent adds into one running total as chunks finish,
+so memory stays flat whatever the number of runs. Sweep values replay the
+same run seeds (common random numbers), so the differences between them
+are not drowned in sampling noise.
+
+    python black_moon_montecarlo.py --runs 100000
+    python black_moon_montecarlo.py --runs 1000000 --policy cautious --workers 8
+    python black_moon_montecarlo.py --runs 20000 --sweep chase:obstacle_speed=8,10,12,14
+    python black_moon_montecarlo.py --runs 20000 --set turbo:needed=12 --skill 0.6 --json
+"""
+import os, sys, json, time, random, argparse
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import black_moon_engine as engine
+from black_moon_engine import ENDINGS, ARCADE_ABORTED, GameState
+from black_moon_arcade import MODES, SCENE_MODES, make_policy, simulate
+
+STATS = ("days_left", "health", "suspicion")
+CHUNK_RUNS = 250        # körningar per uppgift till en arbetare
+MAX_STEPS = 1000        # skydd mot en policy som aldrig når ett slut
+
+
+# =========================
+# Story policies
+# =========================
+def random_policy(rng, state, options):
+    return rng.randrange(len(options))
+
+
+def _risky(opt):
+    return opt.get("goto", "").startswith("E_") or any(
+        e.get("op") == "inc" and e.get("key") in ("health", "days_left") and e.get("value", 0) < 0
+        for e in opt.get("effects") or ())
+
+
+def cautious_policy(rng, state, options):
+    """Random among the options that neither cost health or time nor end the
+       story outright; random among all if every option does."""
+    safe = [i for i, opt in enumerate(options) if not _risky(opt)]
+    return rng.choice(safe) if safe else rng.randrange(len(options))
+
+
+POLICIES = {"random": random_policy, "cautious": cautious_policy}
+
+
+# =========================
+# Counting
+# =========================
+def _add(counts, key, n=1):
+    counts[key] = counts.get(key, 0) + n
+
+
+class Tally:
+    """Counts from any number of playthroughs; merge() adds another Tally."""
+
+    def __init__(self):
+        self.runs = 0
+        self.unfinished = 0
+        self.steps = 0
+        self.endings = {}       # slut -> antal
+        self.arcade = {}        # "läge:utfall" -> antal
+        self.scenes = {}        # scen -> {stat: {värde: antal}}, ett besök per visad scen
+        self.final = {s: {} for s in STATS}   # värden när slutet nåddes
+
+    def visit(self, state):
+        per = self.scenes.get(state.scene)
+        if per is None:
+            per = self.scenes[state.scene] = {s: {} for s in STATS}
+        _add(per["days_left"], state.days_left)
+        _add(per["health"], state.health)
+        _add(per["suspicion"], state.suspicion)
+
+    def merge(self, other):
+        self.runs += other.runs
+        self.unfinished += other.unfinished
+        self.steps += other.steps
+        for key, n in other.endings.items():
+            _add(self.endings, key, n)
+        for key, n in other.arcade.items():
+            _add(self.arcade, key, n)
+        for scene, per in other.scenes.items():
+            mine = self.scenes.setdefault(scene, {s: {} for s in STATS})
+            for stat, counts in per.items():
+                for value, n in counts.items():
+                    _add(mine[stat], value, n)
+        for stat, counts in other.final.items():
+            for value, n in counts.items():
+                _add(self.final[stat], value, n)
+        return self
+
+    def summary(self):
+        runs = self.runs or 1
+        return {
+            "runs": self.runs,
+            "unfinished": self.unfinished,
+            "mean_steps": round(self.steps / runs, 2),
+            "endings": {e: _share(self.endings.get(e, 0), self.runs) for e in ENDINGS},
+            "arcade": dict(sorted(self.arcade.items())),
+            "final": {s: _distribution(c) for s, c in self.final.items()},
+            "scenes": {scene: {"visits": sum(per["health"].values()),
+                               **{s: _distribution(c) for s, c in per.items()}}
+                       for scene, per in sorted(self.scenes.items())},
+        }
+
+
+def _share(n, runs):
+    """Share with a 95 % confidence half-width (normal approximation)."""
+    p = n / runs if runs else 0.0
+    return {"count": n, "share": round(p, 5), "ci95": round(1.96 * (p * (1 - p) / runs) ** 0.5, 5) if runs else 0.0}
+
+
+def _distribution(counts):
+    total = sum(counts.values())
+    if not total:
+        return {"mean": None, "values": {}}
+    mean = sum(v * n for v, n in counts.items()) / total
+    return {"mean": round(mean, 3), "values": {v: round(n / total, 4) for v, n in sorted(counts.items())}}
+
+
+# =========================
+# Playing
+# =========================
+def play(rng, policy, rules, skill, tally):
+    """One playthrough from a new game; every shown scene and the ending go into `tally`."""
+    state = GameState.new()
+    scenes = engine.SCENES
+    for _ in range(MAX_STEPS):
+        scene = state.scene
+        tally.visit(state)
+        if scene.startswith("E_"):
+            tally.runs += 1
+            _add(tally.endings, scene)
+            for stat in STATS:
+                _add(tally.final[stat], getattr(state, stat))
+            return scene
+        tally.steps += 1
+        mode = SCENE_MODES.get(scene)
+        if mode is not None:
+            seed = rng.randrange(1 << 31)
+            outcome = simulate(MODES[mode](seed=seed, **rules.get(mode, {})), make_policy(skill, seed))
+            outcome = outcome or ARCADE_ABORTED
+            _add(tally.arcade, f"{mode}:{outcome}")
+            engine.finish_arcade(state, outcome)
+        else:
+            engine.choose(state, policy(rng, state, scenes[scene]["options"]))
+    tally.runs += 1
+    tally.unfinished += 1
+    return None
+
+
+def run_chunk(seed, first, runs, policy="random", skill=0.8, rules=None):
+    """Play runs first .. first + runs - 1 and return their Tally."""
+    tally = Tally()
+    pick = POLICIES[policy]
+    for run in range(first, first + runs):
+        play(random.Random(f"{seed}:{run}"), pick, rules or {}, skill, tally)
+    return tally
+
+
+def analyze(runs, seed=0, policy="random", skill=0.8, rules=None, workers=None, chunk_runs=CHUNK_RUNS,
+            progress=None):
+    """Total Tally of `runs` playthroughs. workers=0 plays in this process.
+       At most two chunks per worker are in flight, so memory does not grow
+       with `runs`; `progress(done_runs)` is called as chunks complete."""
+    chunks = ((first, min(chunk_runs, runs - first)) for first in range(0, runs, chunk_runs))
+    total = Tally()
+    if workers == 0:
+        for first, n in chunks:
+            total.merge(run_chunk(seed, first, n, policy, skill, rules))
+            if progress:
+                progress(total.runs)
+        return total
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers) as pool:
+        pending = set()
+
+        def submit():
+            nxt = next(chunks, None)
+            if nxt is not None:
+                pending.add(pool.submit(run_chunk, seed, *nxt, policy, skill, rules))
+
+        for _ in range(2 * workers):
+            submit()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                pending.discard(fut)
+                total.merge(fut.result())
+                submit()
+            if progress:
+                progress(total.runs)
+    return total
+
+
+def sensitivity(results, name):
+    """Per ending: change in share per unit of the swept parameter, as a
+       least-squares slope over the sweep values."""
+    xs = [v for v, _ in results]
+    mx = sum(xs) / len(xs)
+    var = sum((x - mx) ** 2 for x in xs)
+    out = {}
+    for ending in ENDINGS:
+        ys = [s["endings"][ending]["share"] for _, s in results]
+        my = sum(ys) / len(ys)
+        out[ending] = round(sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / var, 5) if var else 0.0
+    return {"parameter": name, "share_per_unit": out}
+
+
+def _rule(text):
+    """"chase:obstacle_speed=8,10" -> ("chase", "obstacle_speed", [8, 10])."""
+    name, _, values = text.partition("=")
+    mode, _, param = name.partition(":")
+    if mode not in MODES or not param:
+        raise argparse.ArgumentTypeError(f"expected MODE:NAME=VALUE with MODE one of {', '.join(MODES)}")
+    return mode, param.replace("-", "_"), [int(v) for v in values.split(",")]
+
+
+def print_summary(s, label=""):
+    print(f"{label}{s['runs']} runs, {s['mean_steps']} steps per run"
+          + (f", {s['unfinished']} unfinished" if s["unfinished"] else ""))
+    for ending, e in s["endings"].items():
+        print(f"  {ending:9} {e['share']:7.2%} ± {e['ci95']:.2%}  ({e['count']})")
+    if s["arcade"]:
+        print("  arcade:", ", ".join(f"{k} {n}" for k, n in s["arcade"].items()))
+
+
+def print_scenes(s):
+    print(f"\n{'scene':14} {'visits':>9}  " + "  ".join(f"{st:>10}" for st in STATS) + "   (mean)")
+    for scene, per in s["scenes"].items():
+        means = "  ".join(f"{per[st]['mean']:10.2f}" for st in STATS)
+        print(f"{scene:14} {per['visits']:9d}  {means}")
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Monte Carlo ending distribution of Black Moon.")
+    ap.add_argument("--runs", type=int, default=10000)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--policy", choices=sorted(POLICIES), default="random")
+    ap.add_argument("--skill", type=float, default=0.8, help="simulated arcade driver's reaction chance per frame")
+    ap.add_argument("--workers", type=int, help="processes, default one per CPU; 0 = no pool")
+    ap.add_argument("--chunk", type=int, default=CHUNK_RUNS, help="runs per worker task")
+    ap.add_argument("--set", type=_rule, action="append", default=[], metavar="MODE:NAME=VALUE",
+                    help="override an arcade rule, e.g. --set chase:obstacle_speed=12")
+    ap.add_argument("--sweep", type=_rule, metavar="MODE:NAME=V1,V2,...",
+                    help="repeat the analysis for several values of one arcade rule")
+    ap.add_argument("--scenes", action="store_true", help="also print per-scene means")
+    ap.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = ap.parse_args()
+
+    rules = {}
+    for mode, param, values in args.set:
+        rules.setdefault(mode, {})[param] = values[0]
+    mode, param, values = args.sweep if args.sweep else (None, None, [None])
+
+    def show_progress(done):
+        if sys.stderr.isatty():
+            print(f"\r{done}/{args.runs} runs", end="", file=sys.stderr, flush=True)
+
+    results = []
+    t0 = time.perf_counter()
+    for v in values:
+        swept = {m: dict(r) for m, r in rules.items()}
+        if mode:
+            swept.setdefault(mode, {})[param] = v
+        tally = analyze(args.runs, args.seed, args.policy, args.skill, swept, args.workers, args.chunk,
+                        None if args.json else show_progress)
+        results.append((v, tally.summary()))
+        if sys.stderr.isatty() and not args.json:
+            print("\r", end="", file=sys.stderr)
+    wall = time.perf_counter() - t0
+
+    name = f"{mode}:{param}" if mode else None
+    if args.json:
+        out = {"policy": args.policy, "skill": args.skill, "rules": rules, "seconds": round(wall, 2)}
+        if name:
+            out["sweep"] = [dict(s, value=v) for v, s in results]
+            out["sensitivity"] = sensitivity(results, name)
+        else:
+            out.update(results[0][1])
+        print(json.dumps(out, indent=2))
+        sys.exit(0)
+
+    for v, s in results:
+        print_summary(s, f"{name}={v}: " if name else "")
+    if not name and args.scenes:
+        print_scenes(results[0][1])
+    if name and len(results) > 1:
+        slopes = sensitivity(results, name)["share_per_unit"]
+        print(f"\nChange in ending share per +1 {name}:")
+        for ending, slope in slopes.items():
+            print(f"  {ending:9} {slope:+.2%}")
+    total = args.runs * len(results)
+    print(f"\n{total} runs in {wall:.1f} s ({total / wall:.0f} runs/s)")
+    sys.exit(0)
@@ -0,0 +1,144 @@
+"""Per-phase frame profiler for Black Moon.
+
+FrameProfiler splits every frame of the story loop and the arcade loops into
+phases (waiting for events, event handling, state update, image fetch, text
+layout, blits, display flip) and keeps the last `capacity` frames in a
+fixed-size ring buffer of doubles, so recording never allocates. The buffer
+can be dumped as plain JSON or in Chrome's trace-event format (open it in
+chrome://tracing or Perfetto).
+
+When disabled, frame() and mark() are a shared no-op function bound on the
+instance, so the instrumentation left in the loops costs one empty call per
+phase.
+
+    python black_moon_profiler.py profile.json     # per-phase summary of a dump
+"""
+import os, sys, json, time
+from array import array
+
+from black_moon_util import percentiles, write_json
+
+PHASES = ("wait", "events", "update", "images", "layout", "blit", "flip")
+WAIT, EVENTS, UPDATE, IMAGES, LAYOUT, BLIT, FLIP = range(len(PHASES))
+CONTEXTS = ("story", "arcade")
+STORY_FRAME, ARCADE_FRAME = range(len(CONTEXTS))
+
+
+def _noop(*args):
+    pass
+
+
+class FrameProfiler:
+    """Ring buffer of per-phase frame times (seconds)."""
+
+    def __init__(self, capacity=600, enabled=False, clock=time.perf_counter):
+        self.capacity = capacity
+        self.durations = array("d", bytes(8 * capacity * len(PHASES)))
+        self.starts = array("d", bytes(8 * capacity))
+        self.contexts = bytearray(capacity)
+        self.frames = 0             # inspelade frames totalt; ringen håller de sista `capacity`
+        self._clock = clock
+        self._base = 0
+        self._last = clock()
+        self.disable()
+        if enabled:
+            self.enable()
+
+    def enable(self):
+        if not self.enabled:
+            self.enabled = True
+            del self.frame, self.mark   # tillbaka till klassens metoder
+            self._last = self._clock()
+
+    def disable(self):
+        self.enabled = False
+        self.frame = self.mark = _noop
+
+    def toggle(self):
+        self.disable() if self.enabled else self.enable()
+
+    def frame(self, context=STORY_FRAME):
+        """Start a new frame; the time since the last mark is discarded."""
+        slot = self.frames % self.capacity
+        n = len(PHASES)
+        base = self._base = slot * n
+        d = self.durations
+        for i in range(base, base + n):
+            d[i] = 0.0
+        self._last = self.starts[slot] = self._clock()
+        self.contexts[slot] = context
+        self.frames += 1
+
+    def mark(self, phase):
+        """Charge the time since the previous mark to `phase`."""
+        now = self._clock()
+        self.durations[self._base + phase] += now - self._last
+        self._last = now
+
+    def recent(self, count=None):
+        """(start, context, per-phase seconds) of the last `count` frames, oldest first."""
+        count = min(self.frames, self.capacity, count or self.capacity)
+        n = len(PHASES)
+        out = []
+        for f in range(self.frames - count, self.frames):
+            slot = f % self.capacity
+            out.append((self.starts[slot], CONTEXTS[self.contexts[slot]],
+                        tuple(self.durations[slot * n:(slot + 1) * n])))
+        return out
+
+    def summary(self, frames=None):
+        """p50/p95/p99 in ms per phase and for the busy part of a frame (all but wait)."""
+        frames = self.recent() if frames is None else frames
+        out = {}
+        for i, phase in enumerate(PHASES):
+            out[phase] = percentiles([d[i] for _, _, d in frames], 1000)
+        out["busy"] = percentiles([sum(d) - d[WAIT] for _, _, d in frames], 1000)
+        return out
+
+    def to_json(self):
+        frames = self.recent()
+        return {
+            "phases": PHASES,
+            "frames": [{"t": round(t, 6), "context": ctx, "ms": [round(v * 1000, 4) for v in d]}
+                       for t, ctx, d in frames],
+            "summary": self.summary(frames),
+        }
+
+    def to_chrome_trace(self):
+        """Trace-event JSON. A frame's phases are laid out back to back from
+           the frame start; the buffer keeps per-phase totals, not the order
+           in which phases interleaved."""
+        events = []
+        for t, ctx, d in self.recent():
+            ts = t * 1e6
+            total = sum(d) * 1e6
+            events.append({"name": f"{ctx} frame", "cat": ctx, "ph": "X", "ts": round(ts, 1),
+                           "dur": round(total, 1), "pid": 1, "tid": 1})
+            for phase, seconds in zip(PHASES, d):
+                if seconds:
+                    events.append({"name": phase, "cat": ctx, "ph": "X", "ts": round(ts, 1),
+                                   "dur": round(seconds * 1e6, 1), "pid": 1, "tid": 1})
+                    ts += seconds * 1e6
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def dump(self, prefix):
+        """Write <prefix>.json and <prefix>.trace.json; returns both paths."""
+        os.makedirs(os.path.dirname(prefix) or ".", exist_ok=True)
+        paths = []
+        for path, data in ((prefix + ".json", self.to_json()), (prefix + ".trace.json", self.to_chrome_trace())):
+            write_json(path, data)
+            paths.append(path)
+        return paths
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("usage: python black_moon_profiler.py <dump.json>")
+    with open(sys.argv[1], "r", encoding="utf-8") as f:
+        dump = json.load(f)
+    frames = dump["frames"]
+    counts = ", ".join(f"{c}: {sum(fr['context'] == c for fr in frames)}" for c in CONTEXTS)
+    print(f"{len(frames)} frames ({counts})")
+    print(f"{'phase':8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for phase, q in dump["summary"].items():
+        print(f"{phase:8} {q['p50']:8.3f} {q['p95']:8.3f} {q['p99']:8.3f}")
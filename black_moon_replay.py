@@ -0,0 +1,180 @@
+"""Input recording and headless replay for Black Moon.
+
+A tape holds everything the player fed into one run_game() session: the
+starting state and language, the keys pressed in each frame of the story
+loop, states brought in with L, and for every arcade sequence its seed and
+one steering sample per simulation frame. The rules are deterministic given
+those, so replaying a tape reproduces the session exactly; the state at the
+end of the replay is compared with the one the recording ended on.
+
+    BLACK_MOON_RECORD=session.tape python black_moon_textadventure.py
+    python black_moon_replay.py session.tape           # dummy video driver, no frame limit
+    python black_moon_replay.py session.tape --json
+
+The game module only uses InputRecorder/InputReplay through its TAPE global;
+nothing here imports pygame until a replay is started.
+"""
+import os, sys, json, time, random, argparse, tempfile
+
+from black_moon_util import json_line
+
+TAPE_VERSION = 2   # 2: arkadens timers i hela steg (turbo spelar annorlunda än i version 1)
+
+
+class InputRecorder:
+    """Writes a tape while a live session is played. Every record is flushed
+       at once so a tape survives the crash it is meant to reproduce."""
+    replaying = False
+
+    def __init__(self, path, seed=None):
+        self.path = path
+        self.seed = random.randrange(1 << 31) if seed is None else seed
+        random.seed(self.seed)   # arkadfrön dras ur modulens random
+        self._f = open(path, "w", encoding="utf-8")
+
+    def _write(self, record):
+        self._f.write(json_line(record))
+        self._f.flush()
+
+    def begin(self, state, lang):
+        self._write({"tape": TAPE_VERSION, "seed": self.seed, "lang": lang, "state": state})
+        return state
+
+    def keys(self, frame, keys):
+        if keys:
+            self._write({"f": frame, "k": keys})
+        return keys
+
+    def loaded(self, frame, state):
+        if state:
+            self._write({"f": frame, "load": state})
+        return state
+
+    def arcade_start(self, scene, seed):
+        return seed, None
+
+    def arcade_end(self, scene, seed, samples, outcome):
+        self._write({"arcade": scene, "seed": seed, "input": samples, "outcome": outcome})
+
+    def end(self, state):
+        self._write({"end": state})
+        self._f.close()
+
+
+class InputReplay:
+    """Feeds a recorded tape back into the game in place of live input and
+       notes every place where the replay drifts from the recording."""
+    replaying = True
+
+    def __init__(self, path):
+        with open(path, "r", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        if not records or records[0].get("tape") != TAPE_VERSION:
+            raise ValueError(f"{path}: not a version {TAPE_VERSION} input tape")
+        head = records[0]
+        self.seed, self.lang, self.start_state = head["seed"], head["lang"], head["state"]
+        self.frames = {}        # frame -> [("k", tangenter) | ("load", tillstånd)]
+        self.arcades = []       # (scen, frö, styrning, utfall) i spelordning
+        self.end_state = None   # None om inspelningen aldrig avslutades (krasch)
+        self.last_frame = 0
+        for rec in records[1:]:
+            if "f" in rec:
+                kind = "k" if "k" in rec else "load"
+                self.frames.setdefault(rec["f"], []).append((kind, rec[kind]))
+                self.last_frame = max(self.last_frame, rec["f"])
+            elif "arcade" in rec:
+                self.arcades.append((rec["arcade"], rec["seed"], rec["input"], rec["outcome"]))
+            elif "end" in rec:
+                self.end_state = rec["end"]
+        self._arcade = 0
+        self.final_state = None
+        self.divergences = []
+
+    def begin(self, state, lang):
+        return dict(self.start_state)
+
+    def keys(self, frame, keys=None):
+        """Keys recorded for `frame`; None once the tape has run out."""
+        if frame > self.last_frame:
+            return None
+        return [k for kind, v in self.frames.get(frame, ()) if kind == "k" for k in v]
+
+    def loaded(self, frame, state):
+        """The state the recording loaded in `frame`; the replay's own save
+           slots are ignored since they may not hold the player's saves."""
+        for kind, v in self.frames.get(frame, ()):
+            if kind == "load":
+                return dict(v)
+        return None
+
+    def arcade_start(self, scene, seed):
+        if self._arcade >= len(self.arcades):
+            self.divergences.append(f"arcade {scene}: not on tape")
+            return seed, ""
+        rec_scene, rec_seed, samples, _ = self.arcades[self._arcade]
+        if rec_scene != scene:
+            self.divergences.append(f"arcade {self._arcade}: {scene}, recorded {rec_scene}")
+        return rec_seed, samples
+
+    def arcade_end(self, scene, seed, samples, outcome):
+        if self._arcade < len(self.arcades):
+            _, _, rec_samples, rec_outcome = self.arcades[self._arcade]
+            if (outcome, len(samples)) != (rec_outcome, len(rec_samples)):
+                self.divergences.append(f"arcade {self._arcade}: {outcome} after {len(samples)} frames, "
+                                        f"recorded {rec_outcome} after {len(rec_samples)}")
+        self._arcade += 1
+
+    def end(self, state):
+        self.final_state = dict(state)
+        if self.end_state is not None and self.end_state != self.final_state:
+            self.divergences.append("final state differs from recording")
+
+
+def replay_session(path, save_dir=None):
+    """Replay one tape headless and as fast as possible. Returns a summary
+       dict: frames, arcade runs, wall time and any divergences."""
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import black_moon_textadventure as game
+    from black_moon_journal import SaveSlots
+
+    tape = InputReplay(path)
+    random.seed(tape.seed)
+    game.init_display()
+    game.LANG = tape.lang
+    with tempfile.TemporaryDirectory() as tmp:
+        game.SAVES = SaveSlots(save_dir or tmp)   # repriser rör aldrig spelarens sparfiler
+        game.TAPE = tape
+        t0 = time.perf_counter()
+        try:
+            game.run_game()
+        finally:
+            game.TAPE = None
+        wall = time.perf_counter() - t0
+    return {
+        "tape": path,
+        "frames": tape.last_frame,
+        "arcade_runs": tape._arcade,
+        "arcade_frames": sum(len(a[2]) for a in tape.arcades),
+        "wall_s": round(wall, 3),
+        "final_scene": tape.final_state["scene"] if tape.final_state else None,
+        "complete": tape.end_state is not None,
+        "divergences": tape.divergences,
+    }
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Replay a recorded Black Moon session headless.")
+    ap.add_argument("tape")
+    ap.add_argument("--json", action="store_true", help="print the summary as JSON")
+    args = ap.parse_args()
+    summary = replay_session(args.tape)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print(f"{summary['frames']} frames, {summary['arcade_runs']} arcade runs "
+              f"({summary['arcade_frames']} sim frames) in {summary['wall_s']} s -> {summary['final_scene']}")
+        if not summary["complete"]:
+            print("Recording ended without a final state (crash?); nothing to compare against.")
+        for d in summary["divergences"]:
+            print("DIVERGED:", d)
+    sys.exit(1 if summary["divergences"] else 0)
@@ -0,0 +1,512 @@
+"""Multi-session Black Moon server.
+
+One asyncio process hosts many concurrent playthroughs over a local socket
+(TCP, or a Unix socket with --unix) using the engine's own rules. The
+protocol is newline-delimited JSON: one request object per line, one
+response per line, matched by "id". A client may pipeline any number of
+requests, for any number of sessions, in one write; the server answers a
+whole read in one write, so a gateway multiplexing thousands of sessions
+pays one syscall per batch rather than per step.
+
+    {"id": 1, "op": "new", "lang": "en"}             -> {"id": 1, "session": 7, "scene": "S1", ...}
+    {"id": 2, "op": "choose", "session": 7, "index": 0}
+    {"id": 3, "op": "arcade", "session": 7, "input": "0012...", "outcome": "won"}
+    {"id": 4, "op": "arcade_sim", "session": 7, "skill": 0.8}
+    {"id": 5, "op": "state", "session": 7}  /  "close"  /  "stats"
+
+Each session's state is kept packed (GameState.pack(), one small integer).
+When a choice leads into an arcade node the response carries the mode and a
+seed issued by the server. The client either plays the sequence itself and
+reports its per-frame steering ("0".."3", left = 1, right = 2); the server
+re-runs the same seeded rules on that input and only accepts the outcome
+they produce. Or it asks for arcade_sim, which plays the run server-side
+with a simulated driver. Both run in a worker process, so an arcade never
+stalls the story steps of other sessions.
+
+    python black_moon_server.py serve --port 7777
+    python black_moon_server.py bench --sessions 2000 --rounds 20     # spawns a server on localhost
+    python black_moon_server.py bench --port 7777 --arcade server     # against a running one
+"""
+import os, sys, json, time, random, signal, asyncio, argparse, subprocess
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import black_moon_engine as engine
+from black_moon_engine import ARCADE_ABORTED, GameState
+from black_moon_arcade import MODES, SCENE_MODES as ARCADE_MODES, make_policy, simulate, play_steering
+from black_moon_story import open_pack
+from black_moon_util import json_line, percentiles
+
+SESSION_TTL = 30 * 60       # sekunder utan förfrågningar innan en session tas bort
+MAX_LINE = 1 << 20          # längsta förfrågan (en arkadkörning är ~1 byte per frame)
+MAX_ARCADE_FRAMES = 100_000 # samma gräns som simulate()
+LATENCY_SAMPLES = 1 << 16   # senaste stegtiderna som percentilerna räknas på
+
+
+class RequestError(Exception):
+    """A request the server answers with {"error": ...}."""
+
+
+def _line(obj):
+    return json_line(obj).encode("utf-8")
+
+
+# --- Arkad, körs i en arbetarprocess ---
+
+def verify_arcade(mode, seed, steering, claimed):
+    """Outcome of replaying `steering` through the seeded rules, or None if
+       it does not match what the client claimed."""
+    sim = MODES[mode](seed=seed)
+    outcome = play_steering(sim, steering)
+    if outcome is None:
+        return ARCADE_ABORTED if claimed == ARCADE_ABORTED else None
+    return outcome if claimed == outcome and sim.frame == len(steering) else None
+
+
+def simulate_arcade(mode, seed, skill):
+    """Play the run server-side with the seeded simulated driver."""
+    outcome = simulate(MODES[mode](seed=seed), make_policy(skill, seed))
+    return ARCADE_ABORTED if outcome is None else outcome
+
+
+class LatencyRing:
+    """The last `capacity` latencies in nanoseconds, in a fixed array."""
+
+    def __init__(self, capacity=LATENCY_SAMPLES):
+        self.ns = array("q", bytes(8 * capacity))
+        self.count = 0
+
+    def add(self, ns):
+        self.ns[self.count % len(self.ns)] = ns
+        self.count += 1
+
+    def percentiles(self):
+        """p50/p95/p99 in milliseconds."""
+        return percentiles(self.ns[:min(self.count, len(self.ns))], 1e-6)
+
+
+class Session:
+    __slots__ = ("state", "seen", "arcade_seed", "busy")
+
+    def __init__(self, state):
+        self.state = state          # GameState.pack()
+        self.seen = time.monotonic()
+        self.arcade_seed = None     # utfärdat när sessionen står på en arkadnod
+        self.busy = False           # en arkadkörning kontrolleras just nu
+
+
+class GameServer:
+    """Sessions, request dispatch and latency statistics."""
+
+    def __init__(self, sim_workers=1, pack=None, ttl=SESSION_TTL, seed=None):
+        self.sessions = {}
+        self.next_id = 1
+        self.ttl = ttl
+        self.pack = pack or open_pack()
+        self.rng = random.Random(seed)
+        # 0 arbetare: arkaden körs direkt i eventloopen (enklast att felsöka)
+        self.pool = ProcessPoolExecutor(sim_workers) if sim_workers else None
+        self.steps = LatencyRing()
+        self.arcades = LatencyRing(4096)
+        self.requests = self.batches = self.errors = self.rejected = self.expired = 0
+        self.started = time.monotonic()
+        self.ops = {"new": self.op_new, "choose": self.op_choose, "state": self.op_state,
+                    "close": self.op_close, "stats": self.op_stats,
+                    "arcade": self.op_arcade, "arcade_sim": self.op_arcade_sim}
+
+    # --- Sessioner ---
+
+    def _session(self, req):
+        sid = req.get("session")
+        # Ohashbara värden (listor, objekt) får inte nå dict-uppslaget
+        sess = self.sessions.get(sid) if type(sid) is int else None
+        if sess is None:
+            raise RequestError(f"unknown session {sid!r}")
+        if sess.busy:
+            raise RequestError("arcade result pending")
+        sess.seen = time.monotonic()
+        return sid, sess
+
+    def _store(self, sess, state):
+        sess.state = state.pack()
+        if state.scene in ARCADE_MODES:
+            if sess.arcade_seed is None:
+                sess.arcade_seed = self.rng.randrange(1 << 31)
+        else:
+            sess.arcade_seed = None
+
+    def view(self, sid, sess, lang=None):
+        """What a frontend needs to show the session's current screen."""
+        state = GameState.unpack(sess.state)
+        scene = state.scene
+        out = {"session": sid, "scene": scene,
+               "status": {"health": state.health, "days_left": state.days_left,
+                          "suspicion": state.suspicion, "windom_allies": state.windom_allies}}
+        if scene in ARCADE_MODES:
+            out["arcade"] = {"mode": ARCADE_MODES[scene], "seed": sess.arcade_seed}
+        else:
+            out["options"] = len(engine.SCENES[scene].get("options", ()))
+            out["ending"] = engine.is_ending(state)
+            if lang in self.pack.langs:
+                out["text"] = self.pack.text(scene, lang)
+        return out
+
+    def expire(self):
+        cutoff = time.monotonic() - self.ttl
+        idle = [sid for sid, s in self.sessions.items() if s.seen < cutoff and not s.busy]
+        for sid in idle:
+            del self.sessions[sid]
+        self.expired += len(idle)
+        return len(idle)
+
+    # --- Förfrågningar: svar direkt, eller None om svaret skickas senare ---
+
+    def op_new(self, req, writer):
+        state = GameState.new()
+        if req.get("state") is not None:
+            try:
+                state = GameState.from_dict(req["state"])
+                state.pack()        # okänd scen eller värden som inte ryms
+            except (ValueError, TypeError):
+                raise RequestError("invalid state") from None
+        sid, self.next_id = self.next_id, self.next_id + 1
+        sess = self.sessions[sid] = Session(None)
+        self._store(sess, state)
+        return self.view(sid, sess, req.get("lang"))
+
+    def op_choose(self, req, writer):
+        sid, sess = self._session(req)
+        index = req.get("index")
+        state = GameState.unpack(sess.state)
+        if state.scene in ARCADE_MODES:
+            raise RequestError("arcade sequence pending")
+        if not isinstance(index, int) or not 0 <= index < len(engine.SCENES[state.scene].get("options", ())):
+            raise RequestError(f"no option {index!r}")
+        self._store(sess, engine.choose(state, index))
+        return self.view(sid, sess, req.get("lang"))
+
+    def op_state(self, req, writer):
+        sid, sess = self._session(req)
+        return dict(self.view(sid, sess, req.get("lang")), state=GameState.unpack(sess.state).to_dict())
+
+    def op_close(self, req, writer):
+        sid, _ = self._session(req)
+        del self.sessions[sid]
+        return {"session": sid, "closed": True}
+
+    def op_stats(self, req, writer):
+        return self.stats()
+
+    def _arcade_session(self, req):
+        sid, sess = self._session(req)
+        scene = engine.packed_scene(sess.state)
+        if scene not in ARCADE_MODES:
+            raise RequestError("no arcade sequence pending")
+        return sid, sess, ARCADE_MODES[scene]
+
+    def op_arcade(self, req, writer):
+        sid, sess, mode = self._arcade_session(req)
+        steering, claimed = req.get("input"), req.get("outcome")
+        if not isinstance(steering, str) or len(steering) > MAX_ARCADE_FRAMES or steering.strip("0123"):
+            raise RequestError("input must be a string of steering codes 0-3")
+        return self._run_arcade(req, writer, sid, sess, verify_arcade, mode, sess.arcade_seed, steering, claimed)
+
+    def op_arcade_sim(self, req, writer):
+        sid, sess, mode = self._arcade_session(req)
+        skill = req.get("skill", 0.8)
+        if not isinstance(skill, (int, float)):
+            raise RequestError("skill must be a number")
+        return self._run_arcade(req, writer, sid, sess, simulate_arcade, mode, sess.arcade_seed, float(skill))
+
+    def _run_arcade(self, req, writer, sid, sess, fn, *args):
+        sess.busy = True
+        asyncio.get_running_loop().create_task(self._arcade(req, writer, sid, sess, fn, args))
+        return None
+
+    async def _arcade(self, req, writer, sid, sess, fn, args):
+        t0 = time.perf_counter_ns()
+        try:
+            if self.pool is None:
+                outcome = fn(*args)
+            else:
+                outcome = await asyncio.get_running_loop().run_in_executor(self.pool, fn, *args)
+        except Exception as e:
+            outcome, resp = None, {"error": f"arcade failed: {e!r}"}
+        else:
+            resp = None
+        sess.busy = False
+        if outcome is None:
+            if resp is None:
+                self.rejected += 1
+                resp = {"error": "arcade result rejected"}
+            sess.arcade_seed = None     # nytt frö: samma körning kan inte skickas om
+            self._store(sess, GameState.unpack(sess.state))
+            resp["arcade"] = {"mode": args[0], "seed": sess.arcade_seed}
+            self.errors += 1
+        else:
+            state = engine.finish_arcade(GameState.unpack(sess.state), outcome)
+            sess.arcade_seed = None     # avbruten turbo körs om med nytt frö
+            self._store(sess, state)
+            resp = dict(self.view(sid, sess, req.get("lang")), outcome=outcome)
+        self.arcades.add(time.perf_counter_ns() - t0)
+        resp["id"] = req.get("id")
+        if not writer.is_closing():
+            writer.write(_line(resp))
+
+    def request(self, req, writer):
+        """Handle one request; returns its response line, or b"" if the
+           response is written later."""
+        t0 = time.perf_counter_ns()
+        self.requests += 1
+        try:
+            if not isinstance(req, dict):
+                raise RequestError("request must be an object")
+            op = req.get("op")
+            handler = self.ops.get(op) if isinstance(op, str) else None
+            if handler is None:
+                raise RequestError(f"unknown op {req.get('op')!r}")
+            resp = handler(req, writer)
+            if resp is None:
+                return b""
+        except RequestError as e:
+            self.errors += 1
+            resp = {"error": str(e)}
+        except (TypeError, ValueError, KeyError) as e:
+            # Fel typ i något fält: bara den här förfrågan får fel, inte hela anslutningen
+            self.errors += 1
+            resp = {"error": f"bad request: {e}"}
+        resp["id"] = req.get("id") if isinstance(req, dict) else None
+        self.steps.add(time.perf_counter_ns() - t0)
+        return _line(resp)
+
+    def stats(self):
+        return {"sessions": len(self.sessions), "requests": self.requests, "batches": self.batches,
+                "errors": self.errors, "arcade_rejected": self.rejected, "expired": self.expired,
+                "uptime_s": round(time.monotonic() - self.started, 1),
+                "step_ms": self.steps.percentiles(), "arcade_ms": self.arcades.percentiles()}
+
+    # --- Nätverk ---
+
+    async def _client(self, reader, writer):
+        buf = b""
+        try:
+            while True:
+                data = await reader.read(1 << 16)
+                if not data:
+                    break
+                *lines, buf = (buf + data).split(b"\n")
+                if len(buf) > MAX_LINE:
+                    writer.write(_line({"error": "request too long"}))
+                    break
+                out = []
+                for raw in lines:
+                    if not raw.strip():
+                        continue
+                    try:
+                        req = json.loads(raw)
+                    except ValueError:
+                        self.errors += 1
+                        out.append(_line({"error": "invalid JSON", "id": None}))
+                        continue
+                    out.append(self.request(req, writer))
+                if out:
+                    self.batches += 1
+                    writer.write(b"".join(out))     # ett svar per läsning, hur många förfrågningar den än bar
+                    await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _expire_loop(self):
+        while True:
+            await asyncio.sleep(min(60, self.ttl / 4))
+            self.expire()
+
+    async def serve(self, host="127.0.0.1", port=7777, unix=None):
+        if unix:
+            server = await asyncio.start_unix_server(self._client, unix)
+            where = unix
+        else:
+            server = await asyncio.start_server(self._client, host, port)
+            where = "%s:%d" % server.sockets[0].getsockname()[:2]
+        print(f"listening on {where}", flush=True)   # bench läser den här raden
+        loop = asyncio.get_running_loop()
+        try:
+            # SIGTERM (t.ex. från bench) avslutar via finally, så att arbetarprocesserna inte blir kvar
+            loop.add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        except (NotImplementedError, AttributeError):
+            pass    # Windows: ingen signalhantering i eventloopen
+        expiry = loop.create_task(self._expire_loop())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            expiry.cancel()
+            if self.pool is not None:
+                self.pool.shutdown(cancel_futures=True)
+
+
+# =========================
+# Load generator
+# =========================
+def _play_client_arcade(mode, seed, rng):
+    """Play an arcade run the way a client would and return (steering, outcome).
+       The driver just holds a random direction for a while: the load
+       generator shares the core with the server, so it must stay cheap."""
+    sim = MODES[mode](seed=seed)
+    steering = []
+    code = 0
+    while sim.outcome is None and sim.frame < MAX_ARCADE_FRAMES:
+        if sim.frame % 20 == 0:
+            code = rng.choice((0, 1, 2))
+        steering.append("0123"[code])
+        sim.step(code & 1, code >> 1)
+    return "".join(steering), sim.outcome or ARCADE_ABORTED
+
+
+async def _bench_connection(host, port, unix, sessions, rounds, arcade, skill, seed, rtts, counts):
+    """`sessions` sessions over one connection, every round sending one
+       request per session in a single write."""
+    if unix:
+        reader, writer = await asyncio.open_unix_connection(unix, limit=MAX_LINE)
+    else:
+        reader, writer = await asyncio.open_connection(host, port, limit=MAX_LINE)
+    rng = random.Random(seed)
+    next_id = 0
+
+    async def batch(reqs):
+        nonlocal next_id
+        ids = {}
+        for r in reqs:
+            next_id += 1
+            r["id"] = next_id
+            ids[next_id] = r
+        t0 = time.perf_counter()
+        writer.write(b"".join(_line(r) for r in reqs))
+        await writer.drain()
+        out = {}
+        while len(out) < len(ids):
+            resp = json.loads(await reader.readline())
+            out[resp["id"]] = resp
+            if ids[resp["id"]]["op"] == "choose":
+                rtts.append(time.perf_counter() - t0)
+        return [out[i] for i in ids]
+
+    views = await batch([{"op": "new"} for _ in range(sessions)])
+    for _ in range(rounds):
+        reqs = []
+        for v in views:
+            if "error" in v and "arcade" not in v:
+                raise RuntimeError(f"server error: {v['error']}")
+            if "arcade" in v:
+                a = v["arcade"]
+                if arcade == "skip":
+                    # bara berättelsesteg: arkadnoder ersätts med en ny session
+                    reqs += [{"op": "close", "session": v["session"]}, {"op": "new"}]
+                    continue
+                counts["arcade"] += 1
+                if arcade == "server":
+                    reqs.append({"op": "arcade_sim", "session": v["session"], "skill": skill})
+                else:
+                    steering, outcome = _play_client_arcade(a["mode"], a["seed"], rng)
+                    reqs.append({"op": "arcade", "session": v["session"], "input": steering, "outcome": outcome})
+            elif v["ending"] or not v["options"]:
+                counts["endings"] += 1
+                reqs.append({"op": "new"})
+            else:
+                reqs.append({"op": "choose", "session": v["session"], "index": rng.randrange(v["options"])})
+        views = [v for v in await batch(reqs) if not v.get("closed")]
+        counts["requests"] += len(reqs)
+    writer.close()
+
+
+async def _bench(host, port, unix, sessions, rounds, connections, arcade, skill):
+    rtts = []
+    counts = {"requests": 0, "arcade": 0, "endings": 0}
+    per = [sessions // connections + (i < sessions % connections) for i in range(connections)]
+    t0 = time.perf_counter()
+    await asyncio.gather(*(_bench_connection(host, port, unix, n, rounds, arcade, skill, i, rtts, counts)
+                           for i, n in enumerate(per) if n))
+    wall = time.perf_counter() - t0
+    if unix:
+        reader, writer = await asyncio.open_unix_connection(unix)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    writer.write(_line({"op": "stats", "id": 0}))
+    server = json.loads(await reader.readline())
+    writer.close()
+    return dict(counts, sessions=sessions, connections=connections, wall_s=round(wall, 3),
+                requests_per_s=round(counts["requests"] / wall) if wall else 0,
+                rtt_ms=percentiles(rtts, 1000), server=server)
+
+
+def run_bench(host="127.0.0.1", port=None, unix=None, sessions=2000, rounds=20, connections=8,
+              arcade="client", skill=0.8, sim_workers=1):
+    """Drive a server with `sessions` random players. Without a port or Unix
+       socket a server is spawned on a free localhost port for the run."""
+    proc = None
+    if port is None and unix is None:
+        proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), "serve", "--port", "0",
+                                 "--sim-workers", str(sim_workers)], stdout=subprocess.PIPE, text=True)
+        line = proc.stdout.readline()
+        if not line.startswith("listening on "):
+            proc.kill()
+            raise RuntimeError("server did not start")
+        host, _, port = line.split()[-1].rpartition(":")
+        port = int(port)
+    try:
+        return asyncio.run(_bench(host, port, unix, sessions, rounds, connections, arcade, skill))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Host many Black Moon sessions over a local socket.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sv = sub.add_parser("serve", help="run the server")
+    bn = sub.add_parser("bench", help="load-test a server on localhost (spawns one unless --port/--unix)")
+    for p in (sv, bn):
+        p.add_argument("--host", default="127.0.0.1")
+        p.add_argument("--unix", help="Unix socket path instead of TCP")
+        p.add_argument("--sim-workers", type=int, default=1, help="processes for arcade runs, 0 = in the event loop")
+    sv.add_argument("--port", type=int, default=7777)
+    sv.add_argument("--pack", default=os.environ.get("BLACK_MOON_STORY_PACK"), help="story pack directory")
+    sv.add_argument("--ttl", type=int, default=SESSION_TTL, help="seconds before an idle session is dropped")
+    bn.add_argument("--port", type=int)
+    bn.add_argument("--sessions", type=int, default=2000)
+    bn.add_argument("--rounds", type=int, default=20, help="requests per session")
+    bn.add_argument("--connections", type=int, default=8)
+    bn.add_argument("--arcade", choices=("client", "server", "skip"), default="client",
+                    help="client: play locally and have the server verify; server: arcade_sim; "
+                         "skip: replace sessions that reach an arcade")
+    bn.add_argument("--skill", type=float, default=0.8)
+    bn.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = ap.parse_args()
+
+    if args.cmd == "serve":
+        pack = open_pack(args.pack)
+        if not pack.builtin:
+            engine.use_story(pack.structure, start=pack.start)
+        server = GameServer(args.sim_workers, pack, args.ttl)
+        try:
+            asyncio.run(server.serve(args.host, args.port, args.unix))
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            pass
+        sys.exit(0)
+
+    r = run_bench(args.host, args.port, args.unix, args.sessions, args.rounds, args.connections,
+                  args.arcade, args.skill, args.sim_workers)
+    if args.json:
+        print(json.dumps(r, indent=2))
+    else:
+        s = r["server"]
+        print(f"{r['sessions']} sessions over {r['connections']} connections: {r['requests']} requests "
+              f"in {r['wall_s']} s ({r['requests_per_s']} req/s), {r['arcade']} arcade runs, {r['endings']} endings")
+        print(f"round trip   p50 {r['rtt_ms']['p50']:.3f} ms  p95 {r['rtt_ms']['p95']:.3f} ms  p99 {r['rtt_ms']['p99']:.3f} ms")
+        print(f"server step  p50 {s['step_ms']['p50']:.3f} ms  p95 {s['step_ms']['p95']:.3f} ms  p99 {s['step_ms']['p99']:.3f} ms")
+        print(f"arcade       p50 {s['arcade_ms']['p50']:.3f} ms  p99 {s['arcade_ms']['p99']:.3f} ms, "
+              f"{s['arcade_rejected']} rejected, {s['batches']} batches")
+    sys.exit(0)
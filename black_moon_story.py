@@ -0,0 +1,298 @@
+"""Story packs for Black Moon.
+
+A story pack is a story's structure (scenes, their images and options with
+gotos and effects), its text in one or more languages and the UI strings.
+The structure is what the engine plays and is always loaded whole; it is
+small next to the text. Text is split into chapters of neighbouring scenes
+and loaded per (chapter, language) on demand into a small LRU, so a pack
+with thousands of scenes and many languages starts fast and keeps a flat
+memory profile: only the active language and the chapters around the
+current scene are ever in memory.
+
+The story in black_moon_engine.SCENES together with UI_STR below is the
+built-in pack. A pack directory looks like this:
+
+    index.json                  {"format", "name", "start", "langs",
+                                 "chapters": {chapter: [scene, ...]},
+                                 "scenes": {scene: {"image", "options": [{"goto", "effects"}]}}}
+    text/<lang>/<chapter>.json  {scene: {"title", "text", "options": [label, ...]}}
+    ui/<lang>.json              {key: string}
+
+    python black_moon_story.py export packs/black_moon --chapter-size 8
+    python black_moon_story.py check packs/black_moon
+"""
+import os, sys, json, argparse
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+
+import black_moon_engine as engine
+from black_moon_util import write_json
+
+PACK_FORMAT = 1
+MAX_CHAPTERS = 8        # (kapitel, språk) som hålls i minnet samtidigt
+
+UI_STR = {
+    "sv": {
+        "language_name": "Svenska",
+        "language_title": "Välj språk / Choose language",
+        "status_health": "HÄLSA",
+        "status_days": "DYGN KVAR",
+        "status_susp": "MISSTANKE",
+        "status_allies": "ALLIERADE",
+        "status_slot": "PLATS",
+        "yes": "Ja",
+        "no": "Nej",
+        "restart_prompt": "Tryck valfri tangent för att starta om",
+    },
+    "en": {
+        "language_name": "English",
+        "language_title": "Choose Language / Välj språk",
+        "status_health": "HEALTH",
+        "status_days": "DAYS LEFT",
+        "status_susp": "SUSPICION",
+        "status_allies": "ALLIES",
+        "status_slot": "SLOT",
+        "yes": "Yes",
+        "no": "No",
+        "restart_prompt": "Press any key to restart",
+    }
+}
+
+
+def _structure(sc):
+    """A scene without its text."""
+    out = {"image": sc["image"]}
+    if "options" in sc:
+        out["options"] = [{k: v for k, v in opt.items() if k != "label"} for opt in sc["options"]]
+    return out
+
+
+def _text(sc, lang):
+    return {"title": sc["title"][lang], "text": sc["text"][lang],
+            "options": [opt["label"][lang] for opt in sc.get("options", [])]}
+
+
+def _label(texts, index):
+    labels = texts.get("options") or []
+    return labels[index] if index < len(labels) else None
+
+
+class StoryPack(ABC):
+    """Structure of every scene plus text loaded per (chapter, language).
+       Subclasses supply the two loaders."""
+    builtin = False
+    start = engine.START_SCENE      # scen som ett nytt spel börjar i
+
+    def __init__(self, name, langs, structure, chapters, max_chapters=MAX_CHAPTERS):
+        self.name = name
+        self.langs = tuple(langs)
+        self.structure = structure      # scen -> {"image", "options": [{"goto", "effects"}]}
+        self.chapters = chapters        # kapitel -> [scen, ...]
+        self.chapter_of = {k: c for c, keys in chapters.items() for k in keys}
+        self.max_chapters = max_chapters
+        self._text = OrderedDict()      # (kapitel, språk) -> {scen: text}
+        self._ui = {}
+        self.loads = 0
+        self.evictions = 0
+
+    @abstractmethod
+    def _load_text(self, chapter, lang):
+        """{scene: {"title", "text", "options"}} of one chapter in `lang`."""
+
+    @abstractmethod
+    def _load_ui(self, lang):
+        """{key: string} UI table for `lang`."""
+
+    def chapter_text(self, chapter, lang):
+        key = (chapter, lang)
+        texts = self._text.get(key)
+        if texts is not None:
+            self._text.move_to_end(key)
+            return texts
+        texts = self._text[key] = self._load_text(chapter, lang)
+        self.loads += 1
+        while len(self._text) > self.max_chapters:
+            self._text.popitem(last=False)
+            self.evictions += 1
+        return texts
+
+    def text(self, scene, lang):
+        """{"title", "text", "options": [label, ...]} of `scene` in `lang`."""
+        return self.chapter_text(self.chapter_of[scene], lang)[scene]
+
+    def prefetch(self, scenes, lang):
+        """Load the chapters holding `scenes` (e.g. the successors of the current one)."""
+        for chapter in dict.fromkeys(self.chapter_of[k] for k in scenes if k in self.chapter_of):
+            self.chapter_text(chapter, lang)
+
+    def ui(self, lang):
+        table = self._ui.get(lang)
+        if table is None:
+            table = self._ui[lang] = self._load_ui(lang)
+        return table
+
+    def scenes(self, langs=None):
+        """Full scene dicts (structure and text) in the engine's SCENES format.
+           Reads every chapter; meant for export and checking, not for play."""
+        langs = self.langs if langs is None else langs
+        full, chapters = {}, {}
+        for key, st in self.structure.items():
+            texts = {}
+            for lang in langs:
+                ck = (self.chapter_of.get(key), lang)
+                if ck not in chapters:
+                    chapters[ck] = self._load_text(*ck)
+                # Saknad text blir None, så att compile_story pekar ut exakt vad som fattas
+                texts[lang] = chapters[ck].get(key) or {}
+            sc = {"title": {l: t.get("title") for l, t in texts.items()}, "image": st.get("image"),
+                  "text": {l: t.get("text") for l, t in texts.items()}}
+            if "options" in st:
+                sc["options"] = [dict(opt, label={l: _label(t, i) for l, t in texts.items()})
+                                 for i, opt in enumerate(st["options"])]
+            full[key] = sc
+        return full
+
+    def stats(self):
+        return {"scenes": len(self.structure), "chapters": len(self.chapters),
+                "loaded": len(self._text), "loads": self.loads, "evictions": self.evictions}
+
+
+class BuiltinPack(StoryPack):
+    """The story compiled into black_moon_engine, as a single-chapter pack."""
+    builtin = True
+
+    def __init__(self, scenes=None, ui=None):
+        self._scenes = engine.SCENES if scenes is None else scenes
+        self._ui_tables = UI_STR if ui is None else ui
+        # Strukturen är motorns egna scendikt: inget kopieras för den inbyggda berättelsen
+        super().__init__("builtin", tuple(self._ui_tables), self._scenes, {"builtin": list(self._scenes)})
+
+    def _load_text(self, chapter, lang):
+        return {k: _text(sc, lang) for k, sc in self._scenes.items()}
+
+    def _load_ui(self, lang):
+        return self._ui_tables[lang]
+
+
+class DirectoryPack(StoryPack):
+    """A pack exported to a directory (see the module docstring)."""
+
+    def __init__(self, path, max_chapters=MAX_CHAPTERS):
+        self.path = path
+        with open(os.path.join(path, "index.json"), "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("format") != PACK_FORMAT:
+            raise engine.StoryError(f"{path}: unsupported story pack format {index.get('format')!r}")
+        self.start = index.get("start", engine.START_SCENE)
+        super().__init__(index.get("name", os.path.basename(path)), index["langs"], index["scenes"],
+                         index["chapters"], max_chapters)
+
+    def _read(self, *parts):
+        with open(os.path.join(self.path, *parts), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _load_text(self, chapter, lang):
+        if lang not in self.langs:
+            raise KeyError(f"story pack {self.name!r} has no language {lang!r}")
+        return self._read("text", lang, f"{chapter}.json")
+
+    def _load_ui(self, lang):
+        return self._read("ui", f"{lang}.json")
+
+
+def open_pack(path=None, max_chapters=MAX_CHAPTERS):
+    """The pack at `path`, or the built-in one."""
+    return DirectoryPack(path, max_chapters) if path else BuiltinPack()
+
+
+def _successors(st):
+    """Scenes reachable from a scene's structure: option gotos and the
+       return_scene an arcade sequence comes back to."""
+    for opt in st.get("options", []):
+        if "goto" in opt:
+            yield opt["goto"]
+        for e in opt.get("effects") or ():
+            if e.get("op") == "set" and e.get("key") == "return_scene" and e.get("value"):
+                yield e["value"]
+
+
+def _chapters(structure, start, size):
+    """Split scenes into chapters of `size` in breadth-first order from
+       `start`, so a scene and its successors usually share a chapter."""
+    order, seen = [], set()
+    # Scener som inte nås från start hamnar sist, i strukturens ordning
+    for root in ([start] if start in structure else []) + list(structure):
+        queue = deque([root])
+        while queue:
+            k = queue.popleft()
+            if k in seen or k not in structure:
+                continue
+            seen.add(k)
+            order.append(k)
+            queue.extend(_successors(structure[k]))
+    return {f"c{i // size:03d}": order[i:i + size] for i in range(0, len(order), size)}
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_json(path, data, ensure_ascii=False, indent=1)
+
+
+def export_pack(pack, out_dir, chapter_size=16, name=None, start=None):
+    """Write `pack` as a pack directory; index.json is written last so a
+       half-written export is never picked up. Returns the chapter count."""
+    start = pack.start if start is None else start
+    structure = {k: _structure(sc) if "title" in sc else sc for k, sc in pack.structure.items()}
+    chapters = _chapters(structure, start, chapter_size)
+    for lang in pack.langs:
+        for chapter, keys in chapters.items():
+            _write_json(os.path.join(out_dir, "text", lang, f"{chapter}.json"),
+                        {k: pack.text(k, lang) for k in keys})
+        _write_json(os.path.join(out_dir, "ui", f"{lang}.json"), pack.ui(lang))
+    _write_json(os.path.join(out_dir, "index.json"), {
+        "format": PACK_FORMAT, "name": name or pack.name, "start": start, "langs": list(pack.langs),
+        "chapters": chapters, "scenes": structure,
+    })
+    return len(chapters)
+
+
+def check_pack(pack):
+    """Every problem with `pack`: story errors in any language and UI tables
+       missing keys the game uses."""
+    try:
+        engine.compile_story(pack.scenes(), pack.langs)
+        errors = []
+    except engine.StoryError as e:
+        errors = str(e).splitlines()[1:]
+    except (OSError, KeyError, IndexError, ValueError) as e:
+        errors = [f"unreadable text: {e!r}"]
+    if pack.start not in pack.structure:
+        errors.append(f"unknown start scene {pack.start!r}")
+    for lang in pack.langs:
+        try:
+            missing = sorted(set(UI_STR["en"]) - set(pack.ui(lang)))
+        except (OSError, ValueError) as e:
+            missing = [f"({e!r})"]
+        if missing:
+            errors.append(f"ui[{lang!r}]: missing {', '.join(missing)}")
+    return [e.strip() for e in errors]
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Export or check Black Moon story packs.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    ex = sub.add_parser("export", help="write the built-in story as a pack directory")
+    ex.add_argument("out_dir")
+    ex.add_argument("--chapter-size", type=int, default=16)
+    ck = sub.add_parser("check", help="validate a pack directory in every language")
+    ck.add_argument("pack")
+    args = ap.parse_args()
+    if args.cmd == "export":
+        n = export_pack(BuiltinPack(), args.out_dir, args.chapter_size, name="black_moon")
+        print(f"{len(engine.SCENES)} scenes in {n} chapters written to {args.out_dir}")
+    else:
+        problems = check_pack(open_pack(args.pack))
+        for p in problems:
+            print(p)
+        print(f"{len(problems)} problems" if problems else "Pack OK")
+        sys.exit(1 if problems else 0)
@@ -1,35 +1,152 @@
-import pygame, json, os, sys, random
+import time
+_STARTUP_T0 = time.perf_counter()   # tid till första bild mäts från import
+import pygame, json, os, sys, random, mmap
+_STARTUP_PYGAME_MS = (time.perf_counter() - _STARTUP_T0) * 1000
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 # =========================
 # Config
 # =========================
-WIDTH, HEIGHT = 1280, 720
-FPS = 60
+WIDTH, HEIGHT = 1280, 720     # logisk upplösning: all layout och alla förskalade bilder utgår från den
+FPS = int(os.environ.get("BLACK_MOON_FPS", "60"))   # bildtakt; arkadens simulering går alltid i black_moon_arcade.FPS
+MAX_CATCHUP_MS = 250    # längsta tid en enskild frame får simuleras ikapp i arkaden
 ASSETS_DIR = os.path.join(os.path.dirname(__file__), "assets")
-SAVE_PATH = os.path.join(os.path.dirname(__file__), "savegame.json")
-
-pygame.init()
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("Black Moon — The Pixel Adventure")
-clock = pygame.time.Clock()
-
-# === Arcade: special scene key ===
-ARCADE_SCENE_KEY = "__ARCADE__"
-ARCADE_TURBO_KEY = "__ARCADE_TURBO__"
+BAKED_DIR = os.path.join(ASSETS_DIR, "baked")   # output of bake_assets.py
+SAVE_PATH = os.path.join(os.path.dirname(__file__), "savegame.json")   # gammalt format, läses bara
+SAVE_DIR = os.path.join(os.path.dirname(__file__), "saves")           # en journal per sparplats
+SAVE_SLOTS = 3          # F1..F3 väljer plats
+STORY_PACK = os.environ.get("BLACK_MOON_STORY_PACK")  # katalog med en berättelse (se black_moon_story.py); annars den inbyggda
+RECORD_PATH = os.environ.get("BLACK_MOON_RECORD")   # spela in indata till en tape (se black_moon_replay.py)
+PROFILE_DUMP = os.environ.get("BLACK_MOON_PROFILE_DUMP")  # prefix: profilen skrivs till <prefix>.json/.trace.json vid avslut
+PROFILE_ENABLED = os.environ.get("BLACK_MOON_PROFILE", "") not in ("", "0") or bool(PROFILE_DUMP)
+PROFILE_DIR = os.path.join(os.path.dirname(__file__), "profiles")   # F10 skriver hit
+PROFILE_KEY, PROFILE_DUMP_KEY = pygame.K_F9, pygame.K_F10   # graf av/på, dumpa ringbufferten
+DISPLAY_MODE = os.environ.get("BLACK_MOON_DISPLAY", "window")   # "window", "resizable" eller "fullscreen"
+SCALE_FILTER = os.environ.get("BLACK_MOON_SCALE", "nearest")    # "nearest" (pixelkanter) eller "linear"
+FULLSCREEN_KEY = pygame.K_F11
+REDRAW_EVENTS = (pygame.WINDOWEXPOSED, pygame.VIDEOEXPOSE, pygame.WINDOWSIZECHANGED)  # fönstret måste ritas om
+IMAGE_CACHE_BUDGET = int(os.environ.get("BLACK_MOON_IMAGE_CACHE_MB", "32")) * 1024 * 1024  # bytes of scene surfaces kept in RAM
+RENDER_MODE = os.environ.get("BLACK_MOON_RENDER", "event")  # "event" = rita bara vid ändring, "continuous" = 60 FPS
+IDLE_WAIT_MS = 250      # longest sleep in pygame.event.wait before background work is polled
+END_FADE_MS = int(os.environ.get("BLACK_MOON_END_FADE_MS", "400"))  # intoning av slutbilden, 0 = av
+ARCADE_PARALLAX = int(os.environ.get("BLACK_MOON_PARALLAX", "2"))  # vägkantslager i arkaden, 0 = av
+PREFETCH_WORKERS = 2    # decode threads for upcoming scene images
+PREFETCH_MAX = 8        # decoded-but-unused surfaces kept waiting for a scene change
+FONT_NAMES = "dejavusans,arial,helvetica"
+FONT_CACHE_PATH = os.environ.get("BLACK_MOON_FONT_CACHE",
+                                 os.path.join(os.path.dirname(__file__), ".fontcache.json"))
+STARTUP_TRACE = os.environ.get("BLACK_MOON_STARTUP_TRACE", "") not in ("", "0")  # skriv ut starttider
+STARTUP_TARGET_MS = 300  # mål för kallstart: import -> första bild på skärmen (pygame-importen är ~80 % av det)
+
+# Sätts av init_display(); modulen kan importeras (bake, verktyg) utan fönster
+screen = None
+clock = None
+
+# Story, state and rules live in the pygame-free engine; this module is its pygame client
+from black_moon_engine import (
+    ARCADE_SCENE_KEY, ARCADE_TURBO_KEY, ARCADE_KEYS, ARCADE_WON, ARCADE_CRASHED, ARCADE_ABORTED,
+    SCENES, STORY, new_game_state, apply_effects, check_state, step_scene, finish_arcade,
+    scene_successors, missing_images, choose, use_story,
+)
+from black_moon_story import open_pack
+from black_moon_journal import SaveSlots
+from black_moon_replay import InputRecorder
+from black_moon_profiler import (
+    FrameProfiler, PHASES, WAIT, EVENTS, UPDATE, IMAGES, LAYOUT, BLIT, FLIP, STORY_FRAME, ARCADE_FRAME,
+)
+
+TAPE = None   # InputRecorder vid inspelning, InputReplay vid uppspelning
+
+# Text och UI-strängar kommer ur ett story pack; strukturen spelas av motorn
+PACK = open_pack(STORY_PACK)
+if not PACK.builtin:
+    STORY = use_story(PACK.structure, start=PACK.start)
+    SCENES = PACK.structure
+from black_moon_arcade import ChaseSim, TurboSim, CAR_W, CAR_H, OBSTACLE, PICKUP, FRAME_MS
+from black_moon_util import write_json
 
 
 # =========================
 # Fonts & Colors
 # =========================
-def load_font(size):
+_FONT_DIRS = [
+    "/usr/share/fonts", "/usr/local/share/fonts",
+    os.path.expanduser("~/.fonts"), os.path.expanduser("~/.local/share/fonts"),
+    "/Library/Fonts", "/System/Library/Fonts", os.path.expanduser("~/Library/Fonts"),
+    os.path.join(os.environ.get("WINDIR", "C:\\Windows"), "Fonts"),
+]
+_font_path = False   # False = inte uppslagen än; None = ingen systemfont, använd pygames egen
+_FONTS = {}          # storlek -> Font
+
+_FONT_DIR_DEPTH = 2   # /usr/share/fonts/truetype/<familj>/ ligger två nivåer ned
+
+def _font_set_signature():
+    """mtime of every font directory and its subdirectories down to
+       _FONT_DIR_DEPTH levels (e.g. /usr/share/fonts/truetype/dejavu). Adding
+       or removing a font file in one of them changes its mtime, which
+       invalidates the cache without having to ask fontconfig. Fonts nested
+       deeper are not seen; delete FONT_CACHE_PATH after installing those."""
+    sig = [pygame.version.ver, FONT_NAMES]
+    for root in _FONT_DIRS:
+        try:
+            sig.append([root, os.stat(root).st_mtime_ns])
+        except OSError:
+            continue
+        level = [root]
+        for _ in range(_FONT_DIR_DEPTH):
+            below = []
+            for d in level:
+                try:
+                    with os.scandir(d) as it:
+                        below += [e.path for e in it if e.is_dir()]
+                except OSError:
+                    continue
+            for path in sorted(below):
+                try:
+                    sig.append([path, os.stat(path).st_mtime_ns])
+                except OSError:
+                    pass
+            level = below
+    return sig
+
+def resolve_font_path():
+    """Path of the UI font. match_font() shells out to fontconfig and can take
+       hundreds of milliseconds, so the answer is kept in FONT_CACHE_PATH."""
+    global _font_path
+    if _font_path is not False:
+        return _font_path
+    sig = _font_set_signature()
+    try:
+        with open(FONT_CACHE_PATH, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached["signature"] == sig and (cached["path"] is None or os.path.exists(cached["path"])):
+            _font_path = cached["path"]
+            return _font_path
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
     try:
-        return pygame.font.Font(pygame.font.match_font("dejavusans,arial,helvetica"), size)
-    except:
-        return pygame.font.SysFont(None, size)
+        _font_path = pygame.font.match_font(FONT_NAMES)
+    except Exception:
+        _font_path = None
+    try:
+        write_json(FONT_CACHE_PATH, {"signature": sig, "path": _font_path})
+    except OSError:
+        pass  # skrivskyddad katalog: slå upp igen nästa start
+    return _font_path
 
-FONT_TITLE = load_font(40)
-FONT_TEXT  = load_font(28)
-FONT_UI    = load_font(22)
+def load_font(size):
+    """Font of the given size, created once per size."""
+    font = _FONTS.get(size)
+    if font is None:
+        try:
+            font = pygame.font.Font(resolve_font_path(), size)
+        except (OSError, pygame.error):
+            font = pygame.font.Font(None, size)
+        _FONTS[size] = font
+    return font
+
+FONT_TITLE = FONT_TEXT = FONT_UI = None   # sätts av init_display()
 
 WHITE = (255,255,255)
 BG    = (12,14,22)
@@ -38,69 +155,106 @@ PANEL = (18,20,30)
 # =========================
 # Language & UI strings
 # =========================
-LANG = "sv"  # "sv" or "en"
-
-UI_STR = {
-    "sv": {
-        "language_title": "Välj språk / Choose language",
-        "svenska": "1. Svenska",
-        "engelska": "2. English",
-        "status_health": "HÄLSA",
-        "status_days": "DYGN KVAR",
-        "status_susp": "MISSTANKE",
-        "status_allies": "ALLIERADE",
-        "yes": "Ja",
-        "no": "Nej",
-        "restart_prompt": "Tryck valfri tangent för att starta om",
-    },
-    "en": {
-        "language_title": "Choose Language / Välj språk",
-        "svenska": "1. Svenska",
-        "engelska": "2. English",
-        "status_health": "HEALTH",
-        "status_days": "DAYS LEFT",
-        "status_susp": "SUSPICION",
-        "status_allies": "ALLIES",
-        "yes": "Yes",
-        "no": "No",
-        "restart_prompt": "Press any key to restart",
-    }
-}
+LANG = "sv" if "sv" in PACK.langs else PACK.langs[0]
 
 def tr(key):
-    return UI_STR[LANG][key]
+    return PACK.ui(LANG)[key]
+
+# =========================
+# Startup
+# =========================
+_STARTUP_MARKS = [("pygame import", _STARTUP_PYGAME_MS)]   # (fas, ms sedan import)
+
+def startup_mark(phase):
+    """Record a startup phase; at "first frame" the trace is printed if enabled."""
+    if _STARTUP_MARKS is None:
+        return
+    _STARTUP_MARKS.append((phase, (time.perf_counter() - _STARTUP_T0) * 1000))
+    if phase == "first frame":
+        if STARTUP_TRACE:
+            for name, ms in _STARTUP_MARKS:
+                print(f"startup {name:14} {ms:7.1f} ms")
+            total = _STARTUP_MARKS[-1][1]
+            print(f"time to first frame {total:.0f} ms (target {STARTUP_TARGET_MS} ms"
+                  f"{', over' if total > STARTUP_TARGET_MS else ''})")
+        globals()["_STARTUP_MARKS"] = None   # bara första starten mäts
+
+def _open_window():
+    """The display surface, always WIDTH x HEIGHT. In the resizable and
+       fullscreen modes it is a logical-size back buffer: SDL scales it to
+       the window in one pass on the GPU at every flip, so nothing is ever
+       re-scaled for the output resolution. Nearest filtering keeps pixel
+       edges; the scale is an exact integer whenever the window allows it
+       (2x at 1440p, 3x at 4K)."""
+    if DISPLAY_MODE not in ("resizable", "fullscreen"):
+        return pygame.display.set_mode((WIDTH, HEIGHT))
+    if SCALE_FILTER == "linear":
+        os.environ.setdefault("PYGAME_FORCE_SCALE", "photo")
+    else:
+        os.environ.setdefault("SDL_RENDER_SCALE_QUALITY", "nearest")
+    flags = pygame.SCALED | (pygame.FULLSCREEN if DISPLAY_MODE == "fullscreen" else pygame.RESIZABLE)
+    try:
+        return pygame.display.set_mode((WIDTH, HEIGHT), flags)
+    except pygame.error as e:
+        print("Scaled display unavailable, using a fixed window:", e)
+        return pygame.display.set_mode((WIDTH, HEIGHT))
+
+def toggle_fullscreen():
+    """F11: only for the scaled modes, where the logical size stays the same."""
+    global screen
+    if DISPLAY_MODE in ("resizable", "fullscreen"):
+        try:
+            pygame.display.toggle_fullscreen()
+        except pygame.error as e:
+            print("Fullscreen toggle failed:", e)
+        screen = pygame.display.get_surface()
+
+def init_display():
+    """Open the window and load fonts. Only display and font are initialised:
+       pygame.init() would also open audio and joystick subsystems the game
+       never uses."""
+    global screen, clock, FONT_TITLE, FONT_TEXT, FONT_UI
+    startup_mark("import")
+    pygame.display.init()
+    pygame.font.init()
+    screen = _open_window()
+    pygame.display.set_caption("Black Moon — The Pixel Adventure")
+    clock = pygame.time.Clock()
+    startup_mark("display")
+    FONT_TITLE = load_font(40)
+    FONT_TEXT  = load_font(28)
+    FONT_UI    = load_font(22)
+    startup_mark("fonts")
+    return screen
 
 # =========================
 # Start screen (no bottom text)
 # =========================
 def show_start_screen(screen, clock, img_path, title="BLACK MOON – THE PIXEL ADVENTURE"):
     WIDTH0, HEIGHT0 = screen.get_size()
-    try:
-        img = pygame.image.load(img_path).convert()
-        scale = min(WIDTH0 / img.get_width(), HEIGHT0 / img.get_height())
-        new_size = (int(img.get_width()*scale), int(img.get_height()*scale))
-        img = pygame.transform.smoothscale(img, new_size)
-    except Exception:
-        img = None
-
+    img = TITLE_ASSETS.start_image(img_path, (WIDTH0, HEIGHT0))
     font_big = load_font(48)
 
+    redraw = True
     while True:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit(); sys.exit()
-            elif event.type in (pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN):
-                return
-
-        screen.fill((0,0,0))
-        if img:
-            screen.blit(img, ((WIDTH0 - img.get_width())//2, (HEIGHT0 - img.get_height())//2))
-        else:
-            t = font_big.render(title, True, (230,230,255))
-            screen.blit(t, ((WIDTH0 - t.get_width())//2, HEIGHT0//3))
-
-        pygame.display.flip()
-        clock.tick(60)
+        if redraw:
+            screen.fill((0,0,0))
+            if img:
+                screen.blit(img, (0, 0))
+            else:
+                t = font_big.render(title, True, (230,230,255))
+                screen.blit(t, ((WIDTH0 - t.get_width())//2, HEIGHT0//3))
+            pygame.display.flip()
+            redraw = False
+
+        # Stillbild: sov tills något händer
+        event = pygame.event.wait()
+        if event.type == pygame.QUIT:
+            quit_game()
+        elif event.type in (pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN):
+            return
+        elif event.type in REDRAW_EVENTS:
+            redraw = True
 
 # =========================
 # Language chooser
@@ -109,791 +263,1007 @@ def choose_language(screen, clock):
     global LANG
     font_big = load_font(48)
     font_small = load_font(28)
-    choosing = True
-    while choosing:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit(); sys.exit()
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_1:
-                    LANG = "sv"; choosing = False
-                elif event.key == pygame.K_2:
-                    LANG = "en"; choosing = False
-
-        screen.fill((0,0,0))
-        t = font_big.render(UI_STR["en"]["language_title"], True, WHITE)  # bilingual title looks nicer in EN
-        screen.blit(t, ((WIDTH-t.get_width())//2, HEIGHT//3))
-        opt1 = font_small.render(UI_STR["sv"]["svenska"], True, (200,220,255))
-        opt2 = font_small.render(UI_STR["en"]["engelska"], True, (200,220,255))
-        screen.blit(opt1, (WIDTH//2 - opt1.get_width()//2, HEIGHT//2))
-        screen.blit(opt2, (WIDTH//2 - opt2.get_width()//2, HEIGHT//2+50))
-
-        pygame.display.flip()
-        clock.tick(FPS)
+    langs = PACK.langs[:9]   # tangenterna 1..9
+    title_lang = "en" if "en" in langs else langs[0]   # bilingual title looks nicer in EN
+    t = font_big.render(PACK.ui(title_lang)["language_title"], True, WHITE)
+    opts = [font_small.render(f"{n}. {PACK.ui(lang)['language_name']}", True, (200,220,255))
+            for n, lang in enumerate(langs, start=1)]
+    redraw = True
+    while True:
+        if redraw:
+            screen.fill((0,0,0))
+            screen.blit(t, ((WIDTH-t.get_width())//2, HEIGHT//3))
+            for n, opt in enumerate(opts):
+                screen.blit(opt, (WIDTH//2 - opt.get_width()//2, HEIGHT//2 + 50*n))
+            pygame.display.flip()
+            startup_mark("first frame")
+            redraw = False
+
+        event = pygame.event.wait()
+        if event.type == pygame.QUIT:
+            quit_game()
+        elif event.type == pygame.KEYDOWN:
+            if pygame.K_1 <= event.key < pygame.K_1 + len(langs):
+                LANG = langs[event.key - pygame.K_1]
+                PACK.prefetch([PACK.start], LANG)
+                return
+        elif event.type in REDRAW_EVENTS:
+            redraw = True
 
 # =========================
 # Helpers
 # =========================
-def load_scene_image(name):
-    path = os.path.join(ASSETS_DIR, name)
+_baked_index = None
+
+def _load_baked_index():
+    global _baked_index
+    if _baked_index is None:
+        try:
+            with open(os.path.join(BAKED_DIR, "index.json"), "r", encoding="utf-8") as f:
+                _baked_index = json.load(f).get("images", {})
+        except (OSError, ValueError):
+            _baked_index = {}
+    return _baked_index
+
+def load_baked_image(name, size):
+    """Pre-scaled image written by bake_assets.py, memory-mapped straight into a
+       Surface. None if nothing was baked for this size or the source PNG has
+       changed since the bake. Pass the result through _to_display()."""
+    entry = _load_baked_index().get(f"{size[0]}x{size[1]}/{name}")
+    if entry is None:
+        return None
+    src = os.path.join(ASSETS_DIR, name)
+    path = os.path.join(BAKED_DIR, entry["file"])
+    try:
+        if os.path.exists(src):
+            st = os.stat(src)
+            if (st.st_size, st.st_mtime_ns) != (entry["source_size"], entry["source_mtime_ns"]):
+                return None
+        with open(path, "rb") as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return pygame.image.frombuffer(buf, size, entry["format"])
+    except (OSError, ValueError, KeyError, pygame.error):
+        return None
+
+def _to_display(surf):
+    """convert() unless the surface already has the display's pixel layout,
+       alpha included. A BGRA buffer from frombuffer() carries per-pixel alpha
+       even when every pixel is opaque, and would make each later blit an
+       alpha blend; converting it is one plain copy, done once per cache entry."""
+    if (surf.get_bitsize() == 32 and surf.get_masks() == screen.get_masks()
+            and not surf.get_flags() & pygame.SRCALPHA):
+        return surf
+    return surf.convert()
+
+def _letterbox_start_image(img, size):
+    w, h = size
+    scale = min(w / img.get_width(), h / img.get_height())
+    new_size = (int(img.get_width()*scale), int(img.get_height()*scale))
+    img = pygame.transform.smoothscale(img, new_size)
+    surf = pygame.Surface(size)
+    surf.fill((0,0,0))
+    surf.blit(img, ((w - new_size[0])//2, (h - new_size[1])//2))
+    return surf
+
+class SceneImageCache:
+    """LRU cache of composed (scaled, letterboxed, bordered) scene surfaces.
+       Keyed by (image name, target size); evicts least recently used entries
+       once the stored pixels exceed budget_bytes."""
+
+    def __init__(self, budget_bytes=IMAGE_CACHE_BUDGET):
+        self.budget_bytes = budget_bytes
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+
+    def get(self, key):
+        surf = self._items.get(key)
+        if surf is None:
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return surf
+
+    def put(self, key, surf):
+        if key in self._items:
+            self.bytes_used -= _surface_bytes(self._items.pop(key))
+        self._items[key] = surf
+        self.bytes_used += _surface_bytes(surf)
+        # Behåll alltid senaste bilden, även om den ensam spräcker budgeten
+        while self.bytes_used > self.budget_bytes and len(self._items) > 1:
+            _, old = self._items.popitem(last=False)
+            self.bytes_used -= _surface_bytes(old)
+            self.evictions += 1
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def clear(self):
+        self._items.clear()
+        self.bytes_used = 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "entries": len(self._items), "bytes": self.bytes_used, "budget": self.budget_bytes}
+
+def _surface_bytes(surf):
+    return surf.get_width() * surf.get_height() * surf.get_bytesize()
+
+SCENE_IMAGE_CACHE = SceneImageCache()
+
+def scene_image_key(name):
     max_h = int(HEIGHT*0.52)
+    missing = not os.path.exists(os.path.join(ASSETS_DIR, name))
+    # Platshållaren innehåller text på aktuellt språk
+    return (name, (WIDTH, max_h), LANG if missing else None)
 
-    if not os.path.exists(path):
-        surf = pygame.Surface((WIDTH, max_h))
-        surf.fill((25,28,40))
-        pygame.draw.rect(surf, (60,70,110), surf.get_rect(), width=3, border_radius=12)
-        txt = FONT_TEXT.render(("Missing image: " if LANG=="en" else "Bild saknas: ") + name, True, (220,230,255))
-        surf.blit(txt, (20, 20))
+def load_scene_image(name):
+    key = scene_image_key(name)
+    surf = SCENE_IMAGE_CACHE.get(key)
+    if surf is not None:
         return surf
+    surf = PREFETCHER.take(key)
+    if surf is None and key[2] is None:
+        surf = load_baked_image(name, key[1])
+        if surf is not None:
+            surf = _to_display(surf)
+    if surf is None:
+        path = os.path.join(ASSETS_DIR, name)
+        if key[2] is not None:
+            surf = _missing_scene_image(name, key[1][1])
+        else:
+            surf = _letterbox_scene_image(pygame.image.load(path).convert(), key[1])
+    SCENE_IMAGE_CACHE.put(key, surf)
+    return surf
 
-    img = pygame.image.load(path).convert()
-    scale = min(WIDTH/img.get_width(), max_h/img.get_height())
+def _missing_scene_image(name, max_h):
+    surf = pygame.Surface((WIDTH, max_h))
+    surf.fill((25,28,40))
+    pygame.draw.rect(surf, (60,70,110), surf.get_rect(), width=3, border_radius=12)
+    txt = FONT_TEXT.render(("Missing image: " if LANG=="en" else "Bild saknas: ") + name, True, (220,230,255))
+    surf.blit(txt, (20, 20))
+    return surf
+
+def _letterbox_scene_image(img, size):
+    w, h = size
+    scale = min(w/img.get_width(), h/img.get_height())
     new_s = (int(img.get_width()*scale), int(img.get_height()*scale))
     img = pygame.transform.smoothscale(img, new_s)
 
-    surf = pygame.Surface((WIDTH, max_h))
+    surf = pygame.Surface(size)
     surf.fill((10,12,18))
-    surf.blit(img, ((WIDTH-new_s[0])//2, (max_h-new_s[1])//2))
+    surf.blit(img, ((w-new_s[0])//2, (h-new_s[1])//2))
     pygame.draw.rect(surf, (40,45,70), surf.get_rect(), width=2)
     return surf
 
-def wrap_text(text, font, max_width):
-    words = text.split(" ")
-    lines, line = [], ""
-    for w in words:
-        test = (line + " " + w).strip()
-        if font.size(test)[0] <= max_width:
-            line = test
-        else:
-            if line: lines.append(line)
-            line = w
-    if line: lines.append(line)
-    return lines
+def _decode_scene_image(path, size):
+    """Körs i prefetch-tråd: ingen convert() här, den kräver huvudtråden."""
+    baked = load_baked_image(os.path.basename(path), size)
+    if baked is not None:
+        return baked
+    img = pygame.image.load(path)
+    if img.get_bitsize() not in (24, 32):
+        return None  # smoothscale klarar inte paletter; laddas synkront i stället
+    return _letterbox_scene_image(img, size)
 
 # =========================
-# Game state
+# Prefetch of successor scenes
 # =========================
-def new_game_state():
-    return {
-        "scene": "S1",
-        "has_disk": True,
-        "disk_hidden": False,
-        "trust_nina": None,
-        "windom_allies": False,
-        "days_left": 3,
-        "health": 3,
-        "suspicion": 0,
-        "solo": False,
-        "killed_henchmen": 0,
-        "ending": None,
-        "return_scene": None,   # <-- NYTT: behövs för Arcade Mode
-    }
+class ScenePrefetcher:
+    """Decodes and scales images of upcoming scenes on worker threads.
+       Finished surfaces wait in a bounded store until load_scene_image asks
+       for them; convert() is done then, on the main thread."""
+
+    def __init__(self, cache, workers=PREFETCH_WORKERS, max_ready=PREFETCH_MAX):
+        self.cache = cache
+        self.max_ready = max_ready
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+        self._pending = {}           # key -> Future
+        self._ready = OrderedDict()  # key -> unconverted Surface
+        self.scheduled = 0
+        self.scene_changes = 0
+        self.served = 0     # bilden låg färdig i prefetch-lagret
+        self.waited = 0     # avkodning pågick fortfarande, vi väntade in den
+        self.cached = 0     # bilden fanns redan i scen-cachen
+        self.stalls = 0     # ingen prefetch, synkron laddning
+
+    def schedule(self, scene_keys):
+        for k in scene_keys:
+            key = scene_image_key(SCENES[k]["image"])
+            if key[2] is not None or key in self.cache or key in self._pending or key in self._ready:
+                continue
+            path = os.path.join(ASSETS_DIR, key[0])
+            self._pending[key] = self._pool.submit(_decode_scene_image, path, key[1])
+            self.scheduled += 1
+
+    def collect(self):
+        """Move finished decodes into the ready store (main thread, once per frame)."""
+        for key, fut in list(self._pending.items()):
+            if not fut.done():
+                continue
+            del self._pending[key]
+            surf = None if fut.exception() else fut.result()
+            if surf is not None:
+                self._ready[key] = surf
+                while len(self._ready) > self.max_ready:
+                    self._ready.popitem(last=False)
+
+    def enter_scene(self, scene_key):
+        """Record where the new scene's image comes from, then queue its successors."""
+        self.scene_changes += 1
+        key = scene_image_key(SCENES[scene_key]["image"])
+        if key in self.cache: self.cached += 1
+        elif key in self._ready: self.served += 1
+        elif key in self._pending: self.waited += 1
+        else: self.stalls += 1
+        self.schedule(scene_successors(scene_key))
+
+    def take(self, key):
+        fut = self._pending.pop(key, None)
+        if fut is not None:
+            surf = None if fut.exception() else fut.result()
+        else:
+            surf = self._ready.pop(key, None)
+        return _to_display(surf) if surf is not None else None
+
+    def submit(self, fn, *args):
+        """Run other background decode work on the same worker threads."""
+        return self._pool.submit(fn, *args)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self):
+        return {"scheduled": self.scheduled, "scene_changes": self.scene_changes,
+                "served_from_prefetch": self.served, "waited_on_prefetch": self.waited,
+                "already_cached": self.cached, "stalls": self.stalls,
+                "pending": len(self._pending), "ready": len(self._ready)}
+
+PREFETCHER = ScenePrefetcher(SCENE_IMAGE_CACHE)
 
 # =========================
-# Scenes (bilingual)
+# Title screens (kept for the whole process)
 # =========================
-SCENES = {
-    "S1": {
-        "title": {"sv": "Uppdraget", "en": "The Mission"},
-        "image": "scene_01.png",
-        "text": {
-            "sv": "Sam Quint, f.d. tjuv, anlitas av FBI för att stjäla en disk med bevis mot Lucky Dollar i Las Vegas. Kuppen lyckas – men Marvin Ringer är dig i hälarna.",
-            "en": "Sam Quint, a former thief, is hired by the FBI to steal a disk containing evidence against Lucky Dollar in Las Vegas. The heist succeeds—yet Marvin Ringer is right behind you."
-        },
-        "options": [
-            {"label":{"sv":"Stjäl disken och fly genom öknen.","en":"Steal the disk and escape into the desert."}, "goto":"S2"},
-            {"label":{"sv":"Backa ur. Detta är för riskabelt.","en":"Back out. This is too risky."}, "goto":"E_COWARD"}
-        ]
-    },
-    "S2": {
-        "title": {"sv":"Macken i öknen", "en":"Desert Gas Station"},
-        "image": "scene_02.png",
-        "text": {
-            "sv": "Vid en enslig mack korsar du Earl Windom som fraktar prototypen Black Moon. Du behöver gömma disken innan Ringer hinner ifatt.",
-            "en": "At a lonely gas station you cross paths with Earl Windom hauling the Black Moon prototype. You need to hide the disk before Ringer catches up."
-        },
-        "options": [
-            {"label":{"sv":"Göm disken i Black Moons bakre stötfångare.","en":"Hide the disk in Black Moon’s rear bumper."},
-             "goto":"S3", "effects":[{"op":"set","key":"disk_hidden","value":True}]},
-            {"label":{"sv":"Behåll disken på dig och kör mot Los Angeles.","en":"Keep the disk and drive toward Los Angeles."},
-             "goto":"S3B"}
-        ]
-    },
-    "S3": {
-        "title": {"sv":"Los Angeles", "en":"Los Angeles"},
-        "image": "scene_03.png",
-        "text": {
-            "sv": "I L.A. möter du FBI-agent Johnson. Du kräver dubbelt betalt och ett rent pass – Ringer är ett större problem än utlovat.",
-            "en": "In L.A., you meet FBI agent Johnson. You demand double pay and a clean passport—Ringer is a bigger problem than promised."
-        },
-        "options": [
-            {"label":{"sv":"Acceptera hans villkor och fortsätt jobbet.","en":"Accept his terms and continue."}, "goto":"S4"},
-            {"label":{"sv":"Pressa ännu hårdare – det kostar tid.","en":"Push for more—at the cost of time and heat."},
-             "goto":"S4", "effects":[{"op":"inc","key":"days_left","value":-1},{"op":"inc","key":"suspicion","value":1}]}
-        ]
-    },
-    "S3B": {
-        "title": {"sv":"Riskabelt val","en":"Risky Choice"},
-        "image": "scene_03.png",
-        "text": {
-            "sv":"Du bar kvar disken. Ringer nosar upp spår och du ligger efter i tid.",
-            "en":"You kept the disk. Ringer picks up your trail and you lose time."
-        },
-        "options": [
-            {"label":{"sv":"Acceptera Johnsons villkor och fortsätt.","en":"Accept Johnson’s terms and proceed."},
-             "goto":"S4", "effects":[{"op":"inc","key":"suspicion","value":1},{"op":"inc","key":"days_left","value":-1}]}
-        ]
-    },
- "S4": {
-    "title": {"sv":"Restaurangen","en":"The Restaurant"},
-    "image": "scene_04.png",
-    "text": {
-        "sv":"Windom anländer till en fin restaurang. Du spanar – men Nina och hennes liga stjäl bilarna, inklusive Black Moon, direkt från trailern.",
-        "en":"Windom arrives at a plush restaurant. You stake it out—but Nina’s crew steals every car, including Black Moon right off the trailer."
-    },
-    "options": [
-        {
-            "label": {
-                "sv":"Kasta dig i jakt, följ spåren till ett kontorstorn.",
-                "en":"Dive into a chase, follow the trail to an office tower."
-            },
-            "goto":"S5A",
-            "effects":[{"op":"inc","key":"suspicion","value":1}]
-        },
-        {
-            "label": {
-                "sv":"Spåra metodiskt via kameror och register.",
-                "en":"Track methodically via cameras and records."
-            },
-            "goto":"S5B"
-        },
-        {
-            "label": {
-                "sv": "Jaga efter Nina genom staden (Arcade Mode).",
-                "en": "Chase Nina through the city (Arcade Mode)."
-            },
-            "goto": "__ARCADE__", 
-            "effects": [
-                {"op":"set","key":"return_scene","value":"S5A"}
-            ]
-        }
-    ]
-},
-
-    "S5A": {
-        "title": {"sv":"Garagejakten","en":"The Garage Chase"},
-        "image": "scene_05.png",
-        "text": {
-            "sv":"Du når Ryland Towers men förlorar spåret i garaget. Kameror fångar din siluett.",
-            "en":"You reach Ryland Towers but lose the trail in the garage. Cameras catch your silhouette."
-        },
-        "options": [{"label":{"sv":"Gå vidare.","en":"Continue."}, "goto":"S6"}]
-    },
-    "S5B": {
-        "title": {"sv":"Metodiskt spår","en":"Careful Trail"},
-        "image": "scene_05.png",
-        "text": {
-            "sv":"Spaningen pekar mot Ryland Towers – och Ed Rylands stulna-bilsyndikat.",
-            "en":"The trail points to Ryland Towers—and Ed Ryland’s stolen car syndicate."
-        },
-        "options": [{"label":{"sv":"Gå vidare.","en":"Continue."}, "goto":"S6"}]
-    },
-    "S6": {
-        "title": {"sv":"Tre dagar","en":"Three Days"},
-        "image": "scene_06.png",
-        "text": {
-            "sv":"Johnson varnar: utan disk inom 3 dagar faller målet. Windom vill kontakta polis först.",
-            "en":"Johnson warns: without the disk in 3 days, the case collapses. Windom wants to go to the police first."
-        },
-        "options": [
-            {"label":{"sv":"Be Windom om hjälp – de säger nej (till att börja med).","en":"Ask Windom for help—they refuse at first."}, "goto":"S7"},
-            {"label":{"sv":"Jobba solo och spara tid.","en":"Work solo to save time."}, "goto":"S7", "effects":[{"op":"set","key":"solo","value":True}]}
-        ]
-    },
-    "S7": {
-        "title": {"sv":"Nattklubben","en":"The Nightclub"},
-        "image": "scene_07.png",
-        "text": {
-            "sv":"Du följer Nina till en klubb. Ni klickar – men kan du lita på henne?",
-            "en":"You follow Nina to a club. You connect—but can you trust her?"
-        },
-        "options": [
-            {"label":{"sv":"Visa tillit till Nina.","en":"Trust Nina."}, "goto":"S8", "effects":[{"op":"set","key":"trust_nina","value":True}]},
-            {"label":{"sv":"Håll distans – fokus på bilen.","en":"Keep your distance—focus on the car."}, "goto":"S8", "effects":[{"op":"set","key":"trust_nina","value":False}]}
-        ]
-    },
-    "S8": {
-        "title": {"sv":"Bakhåll","en":"Ambush"},
-        "image": "scene_08.png",
-        "text": {
-            "sv":"Windoms team granskar tornen; en i teamet dödas av Rylands folk. De vänder sig till dig. Ringer hittar dig och anfaller.",
-            "en":"Windom’s team checks the towers; one is killed by Ryland’s men. They turn to you. Ringer finds you and attacks."
-        },
-        "options": [
-            {"label":{"sv":"Fly över taket (du skadas).","en":"Flee over the rooftop (you’re hurt)."},
-             "goto":"S9", "effects":[{"op":"inc","key":"health","value":-1},{"op":"set","key":"windom_allies","value":True}]},
-            {"label":{"sv":"Slå tillbaka (du gör motstånd men blottar dig).","en":"Fight back (you resist but expose yourself)."},
-             "goto":"S9", "effects":[{"op":"inc","key":"health","value":-1},{"op":"inc","key":"killed_henchmen","value":2},{"op":"set","key":"windom_allies","value":True}]}
-        ]
-    },
-    "S9": {
-        "title": {"sv":"Planen","en":"The Plan"},
-        "image": "scene_09.png",
-        "text": {
-            "sv":"Huvudgaraget är ointagligt. Ni bestämmer er för att ta er in via det oavslutade tornet.",
-            "en":"The main garage is impenetrable. You decide to enter via the unfinished tower."
-        },
-        "options": [
-            {"label":{"sv":"Invänta natt (säkrare).","en":"Wait for night (safer)."},
-             "goto":"S10", "effects":[{"op":"inc","key":"days_left","value":-1}]},
-            {"label":{"sv":"Gå direkt (snabbt men riskabelt, kostar tid).","en":"Go now (fast but risky, still costs time)."},
-             "goto":"S10", "effects":[{"op":"inc","key":"days_left","value":-1}]}
-        ]
-    },
-    "S10": {
-        "title": {"sv":"Ventilationsschaktet","en":"The Vent Shaft"},
-        "image": "scene_10.png",
-        "text": {
-            "sv":"Du klättrar ned i schaktet – och hittar Nina inspärrad. Ryland misstänker henne.",
-            "en":"You climb down the shaft—and find Nina locked up. Ryland suspects her."
-        },
-        "options": [
-            {"label":{"sv":"Rädda Nina. Två är bättre än en.","en":"Rescue Nina. Two are better than one."},
-             "goto":"S11", "effects":[{"op":"set","key":"trust_nina","value":True}]},
-            {"label":{"sv":"Lämna henne. Tiden är knapp.","en":"Leave her. Time is critical."}, "goto":"S11B"}
-        ]
-    },
-  "S11": {
-    "title": {"sv":"Chop shop-kuppen","en":"Chop Shop Heist"},
-    "image": "scene_11.png",
-    "text": {
-        "sv":"I stulna uniformer rullar ni ut Black Moon. Windom spränger porten men nödgaller faller. Ni kör in i lasthissen mot Rylands våningsplan.",
-        "en":"In stolen uniforms you roll out Black Moon. Windom blows the door but emergency bars drop. You drive into the freight elevator toward Ryland’s floor."
-    },
-    "options": [
-        {
-            "label": {
-                "sv": "Aktivera turbon och samla kraft för att flyga genom fönstret (Arcade Mode).",
-                "en": "Activate turbo and gather power to fly through the window (Arcade Mode)."
-            },
-            "goto": "__ARCADE_TURBO__",
-            "effects": [
-                {"op": "set", "key": "return_scene", "value": "S12"}
-            ]
-        }
-    ]
-},
-
-    "S11B": {
-        "title": {"sv":"Solo i kaoset","en":"Solo in the Chaos"},
-        "image": "scene_11.png",
-        "text": {
-            "sv":"Du kör ensam. Utan Ninas hjälp blir reträtten rörigare och du skadas.",
-            "en":"You drive solo. Without Nina’s help the retreat is messier and you’re hurt."
-        },
-        "options": [{"label":{"sv":"Aktivera turbon – rakt mot fönstret!","en":"Hit turbo—straight at the window!"},
-                     "goto":"S12", "effects":[{"op":"inc","key":"health","value":-1}]}]
-    },
-    "S12": {
-        "title": {"sv":"Genom glaset","en":"Through the Glass"},
-        "image": "scene_11.png",
-        "text": {
-            "sv":"Black Moon skjuter fram – Ryland mejas, bilen flyger in i det tomma tornet. Du får ut disken...",
-            "en":"Black Moon surges—Ryland is struck, the car leaps into the empty tower. You retrieve the disk..."
-        },
-        "options": [{"label":{"sv":"Möt Ringer: slåss om disken.","en":"Face Ringer: fight for the disk."}, "goto":"S13"}]
-    },
-    "S13": {
-        "title": {"sv":"Final","en":"Finale"},
-        "image": "scene_12.png",
-        "text": {
-            "sv":"Ringer dyker upp för att hämta disken. Johnson närmar sig. Allt avgörs nu.",
-            "en":"Ringer arrives to seize the disk. Johnson closes in. Everything is decided now."
-        },
-        "options": [
-            {"label":{"sv":"Ge disken till Johnson och dra dig tillbaka.","en":"Give the disk to Johnson and walk away."}, "goto":"E_GOOD"},
-            {"label":{"sv":"Behåll disken – sälj den själv.","en":"Keep the disk—sell it yourself."}, "goto":"E_GREED"},
-        ]
-    },
-
-    # Endings
-    "E_COWARD": {
-        "title":{"sv":"Game Over","en":"Game Over"},
-        "image":"scene_03.png",
-        "text":{"sv":"Du backade ur. Lucky Dollar går fria.","en":"You backed out. Lucky Dollar walks free."},
-        "options":[]
-    },
-    "E_TIME": {
-        "title":{"sv":"För sent","en":"Too Late"},
-        "image":"scene_06.png",
-        "text":{"sv":"Tre dagar gick. Fallet faller i domstol.","en":"Three days passed. The case collapses in court."},
-        "options":[]
-    },
-    "E_DEAD": {
-        "title":{"sv":"Skadad till fall","en":"Down and Out"},
-        "image":"scene_08.png",
-        "text":{"sv":"Skadorna blir för svåra.","en":"Your injuries are too severe."},
-        "options":[]
-    },
-    "E_GOOD": {
-        "title":{"sv":"You Win!","en":"You Win!"},
-        "image":"scene_12.png",
-        "text":{"sv":"Du lämnar disken till Johnson. Pensionen väntar.","en":"You hand the disk to Johnson. Retirement awaits."},
-        "options":[]
-    },
-    "E_GREED": {
-        "title":{"sv":"Girighetens pris","en":"Price of Greed"},
-        "image":"scene_12.png",
-        "text":{"sv":"Du försöker sälja disken. Ringer jagar dig för evigt.","en":"You try to sell the disk. Ringer hunts you forever."},
-        "options":[]
-    }
-}
+def _decode_start_image(path, size):
+    """Prefetch-tråd: färdigskalad startbild, ännu inte convert()ad. None om den saknas."""
+    baked = load_baked_image(os.path.basename(path), size)
+    if baked is not None:
+        return baked
+    if not os.path.exists(path):
+        return None
+    img = pygame.image.load(path)
+    if img.get_bitsize() not in (24, 32):
+        return None  # palettbilder kräver convert(); laddas synkront i start_image()
+    return _letterbox_start_image(img, size)
+
+class TitleAssets:
+    """Start-screen image, held for the lifetime of the process so restarting
+       after an ending never touches the disk (fonts are memoized by
+       load_font). warm()
+       decodes the start image on the prefetch pool while the language
+       chooser is up; start_image() finishes it on the main thread."""
+
+    def __init__(self, prefetcher):
+        self.prefetcher = prefetcher
+        self._images = {}       # (sökväg, storlek) -> Surface eller None
+        self._pending = {}      # (sökväg, storlek) -> Future
+
+    def warm(self, img_path, size):
+        key = (img_path, tuple(size))
+        if key not in self._images and key not in self._pending:
+            self._pending[key] = self.prefetcher.submit(_decode_start_image, img_path, key[1])
+
+    def start_image(self, img_path, size):
+        key = (img_path, tuple(size))
+        if key in self._images:
+            return self._images[key]
+        fut = self._pending.pop(key, None)
+        img = None
+        if fut is not None and not fut.exception():
+            img = fut.result()
+        if img is None and os.path.exists(img_path):
+            try:
+                img = _letterbox_start_image(pygame.image.load(img_path).convert(), key[1])
+            except pygame.error:
+                img = None
+        img = self._images[key] = _to_display(img) if img is not None else None
+        return img
+
+TITLE_ASSETS = TitleAssets(PREFETCHER)
+
+_TEXT_WIDTHS = {}   # (font, word) -> pixelbredd
+
+def text_width(font, text):
+    """Memoized font.size(text)[0]."""
+    key = (font, text)
+    w = _TEXT_WIDTHS.get(key)
+    if w is None:
+        if len(_TEXT_WIDTHS) > 20000:
+            _TEXT_WIDTHS.clear()
+        w = _TEXT_WIDTHS[key] = font.size(text)[0]
+    return w
+
+def wrap_text(text, font, max_width):
+    # Linjär: radbredden uppskattas som summan av ordbredder + mellanslag i
+    # stället för att mäta om hela raden för varje nytt ord. Kerning/avrundning
+    # gör summan några pixlar fel, så nära kanten mäts raden på riktigt.
+    space = text_width(font, " ")
+    lines, line, line_w = [], [], 0
+    for w in text.split(" "):
+        if not w:
+            continue
+        ww = text_width(font, w)
+        test_w = line_w + space + ww if line else ww
+        slack = 2 * (len(line) + 1)
+        if test_w <= max_width - slack:
+            fits = True
+        elif test_w > max_width + slack:
+            fits = False
+        else:
+            test_w = font.size(" ".join(line + [w]))[0]
+            fits = test_w <= max_width
+        if fits:
+            line.append(w)
+            line_w = test_w
+        else:
+            if line: lines.append(" ".join(line))
+            line, line_w = [w], ww
+    if line: lines.append(" ".join(line))
+    return lines
 
 # =========================
 # Rendering & state updates
 # =========================
 
-def run_arcade(state, duration_sec=18, max_hits=3, obstacle_speed=10, car_speed=9):
-    """Enkel 2D-biljakt: vänster/höger för att undvika hinder och jaga Nina.
-       Överlev duration_sec sekunder. Vid max_hits krockar: -1 health.
-       Returnerar uppdaterat state och hoppar tillbaka till state['return_scene']."""
-    import random  # säkerställ slump även om det inte är importerat globalt
-
-    # --- Spelarbil (rektangel eller sprite) ---
-    car = pygame.Rect(WIDTH//2 - 26, HEIGHT - 120, 52, 90)
-    car_img = None
-    try:
-        car_img = pygame.image.load(os.path.join(ASSETS_DIR, "arcade_car.png")).convert_alpha()
-        car_img = pygame.transform.smoothscale(car_img, (car.w, car.h))
-    except:
-        car_img = None  # fallback till rektangel
-
-    # --- Hinder (rektangel eller sprite) ---
-    obstacles = []
-    obs_img = None
-    try:
-        obs_img = pygame.image.load(os.path.join(ASSETS_DIR, "arcade_obstacle.png")).convert_alpha()
-        obs_img = pygame.transform.smoothscale(obs_img, (50, 50))
-    except:
-        obs_img = None
-
-    # --- Ninas bil: dyker upp ibland framåt på vägen ---
-    nina_rect = pygame.Rect(WIDTH//2 - 26, HEIGHT//2 - 100, 52, 90)
-    nina_img = None
-    nina_timer = 0  # frames kvar som Nina syns
-    try:
-        nina_img = pygame.image.load(os.path.join(ASSETS_DIR, "nina_car.png")).convert_alpha()
-        nina_img = pygame.transform.smoothscale(nina_img, (nina_rect.w, nina_rect.h))
-    except:
-        nina_img = None  # fallback till färgad rektangel
-
-    spawn_timer_ms = 0
-    hits = 0
-    start_ticks = pygame.time.get_ticks()
-    running = True
+# =========================
+# Arcade (pygame view of black_moon_arcade)
+# =========================
+ARCADE_SPRITES = {  # namn -> (fil i assets/, storlek)
+    "car": ("arcade_car.png", (CAR_W, CAR_H)),
+    "obstacle": ("arcade_obstacle.png", (OBSTACLE, OBSTACLE)),
+    "nina": ("nina_car.png", (CAR_W, CAR_H)),
+    "pickup": ("arcade_pickup.png", (PICKUP, PICKUP)),
+}
 
-    while running:
-        dt = clock.tick(FPS)
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit(); sys.exit()
-            elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
-                # Avbryt: ingen extra straff förutom utebliven vinst
-                running = False
+class SpriteAtlas:
+    """Arcade sprites scaled once and packed into one surface for the whole
+       process. get(name) returns a subsurface, or None when the file is
+       missing so the caller draws its rectangle fallback."""
+
+    def __init__(self, specs):
+        self.specs = specs
+        self.surface = None
+        self._sprites = None
+
+    def load(self):
+        if self._sprites is not None:
+            return self
+        imgs = {}
+        for name, (filename, size) in self.specs.items():
+            path = os.path.join(ASSETS_DIR, filename)
+            if not os.path.exists(path):
+                continue
+            try:
+                imgs[name] = pygame.transform.smoothscale(pygame.image.load(path).convert_alpha(), size)
+            except pygame.error as e:
+                print(f"Arcade sprite {filename}: {e}")
+        w = sum(img.get_width() for img in imgs.values()) or 1
+        h = max((img.get_height() for img in imgs.values()), default=1)
+        self.surface = pygame.Surface((w, h), pygame.SRCALPHA)
+        self._sprites = dict.fromkeys(self.specs)
+        x = 0
+        for name, img in imgs.items():
+            # MAX mot en genomskinlig yta = exakt kopia inklusive alfa
+            self.surface.blit(img, (x, 0), special_flags=pygame.BLEND_RGBA_MAX)
+            self._sprites[name] = self.surface.subsurface((x, 0, img.get_width(), img.get_height()))
+            x += img.get_width()
+        return self
+
+    def get(self, name):
+        return self.load()._sprites[name]
+
+ARCADE_ATLAS = SpriteAtlas(ARCADE_SPRITES)
+
+_HUD_TEXT = {}
+
+def _hud_text(text, color):
+    """FONT_UI.render memoized; HUD strings only change a few times per run."""
+    surf = _HUD_TEXT.get((text, color))
+    if surf is None:
+        if len(_HUD_TEXT) > 256:
+            _HUD_TEXT.clear()
+        surf = _HUD_TEXT[(text, color)] = FONT_UI.render(text, True, color)
+    return surf
 
-        # --- Input / rörelse: snabbare sidofart ---
-        keys = pygame.key.get_pressed()
-        if keys[pygame.K_LEFT] or keys[pygame.K_a]:
-            car.x -= car_speed
-        if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
-            car.x += car_speed
-        car.x = max(0, min(WIDTH - car.w, car.x))
-
-        # --- Spawn hinder med intervall (ms) ---
-        spawn_timer_ms += dt
-        if spawn_timer_ms > 700:
-            spawn_timer_ms = 0
-            ox = random.randint(20, WIDTH - 70)
-            obstacles.append(pygame.Rect(ox, -60, 50, 50))
-
-        # --- Uppdatera hinder + kollisioner ---
-        for o in obstacles:
-            o.y += obstacle_speed
-        for o in obstacles[:]:
-            if o.colliderect(car):
-                hits += 1
-                obstacles.remove(o)
-        obstacles = [o for o in obstacles if o.y < HEIGHT + 60]
-
-        # --- Slumpa Ninas närvaro (ca var 4–6:e sekund) ---
-        # Visas i ~2 sek (120 frames @ 60fps)
-        if nina_timer <= 0 and random.randint(0, 300) == 1:
-            nina_rect.x = random.randint(int(WIDTH*0.25), int(WIDTH*0.75) - nina_rect.w)
-            nina_rect.y = HEIGHT//2 - random.randint(80, 140)
-            nina_timer = 120
+def _draw_pool(pool, img, color, dy=0):
+    """Draw every entity in an EntityPool, shifted down by dy: one batched
+       blits() call with a sprite, otherwise plain rectangles."""
+    if img:
+        if dy:
+            screen.blits([(img, (x, y + dy)) for x, y in pool], doreturn=False)
         else:
-            if nina_timer > 0:
-                nina_timer -= 1
-
-        # --- Rita scen ---
-        screen.fill((6, 8, 14))
-        # väg
-        pygame.draw.rect(screen, (20, 22, 30), (int(WIDTH*0.18), 0, int(WIDTH*0.64), HEIGHT))
-        # mittstreck (scroll)
-        scroll = (pygame.time.get_ticks() // 6) % 40
-        for y in range(-40, HEIGHT, 40):
-            pygame.draw.rect(screen, (200,200,220), (WIDTH//2 - 5, y + scroll, 10, 20))
-
-        # hinder
-        for o in obstacles:
-            if obs_img: screen.blit(obs_img, o)
-            else: pygame.draw.rect(screen, (170, 80, 80), o)
-
+            screen.blits([(img, pos) for pos in pool], doreturn=False)
+    else:
+        for x, y in pool:
+            pygame.draw.rect(screen, color, (x, y + dy, pool.w, pool.h))
+
+class RoadBackground:
+    """Road, lane markings and roadside parallax layers, pre-rendered once.
+       The road is a tile one stripe period taller than the screen, so a
+       single blit at a scroll offset covers the frame. Each parallax layer is
+       a pair of roadside strips drawn the same way at its own speed."""
+    STRIPE = 40     # mittstreckens period i pixlar
+
+    def __init__(self, bg, road, layers=ARCADE_PARALLAX):
+        road_x, road_w = int(WIDTH*0.18), int(WIDTH*0.64)
+        self.tile = pygame.Surface((WIDTH, HEIGHT + self.STRIPE)).convert()
+        self.tile.fill(bg)
+        pygame.draw.rect(self.tile, road, (road_x, 0, road_w, self.tile.get_height()))
+        for y in range(0, self.tile.get_height(), self.STRIPE):
+            pygame.draw.rect(self.tile, (200,200,220), (WIDTH//2 - 5, y, 10, 20))
+
+        # Parallax: fjärran prickar (långsamt) och närmare stolpar (snabbare)
+        rng = random.Random(7)
+        self.layers = []
+        for i in range(layers):
+            period = 120 + 60*i
+            speed = 0.5 + i
+            strip = pygame.Surface((road_x, HEIGHT + period)).convert()
+            strip.fill((255, 0, 255))
+            strip.set_colorkey((255, 0, 255))
+            shade = 40 + 30*i
+            # Mönstret måste upprepas exakt varje period för sömlös scroll
+            dots = [(rng.randint(10, road_x - 10), rng.randint(0, period - 1)) for _ in range(3)]
+            for y in range(0, strip.get_height(), period):
+                if i == 0:
+                    for dx, dy in dots:
+                        pygame.draw.circle(strip, (shade, shade + 10, shade + 25), (dx, y + dy), 3)
+                else:
+                    pygame.draw.rect(strip, (shade + 20, shade + 20, shade + 40), (road_x - 30, y, 8, 26))
+            mirrored = pygame.transform.flip(strip, True, False)
+            mirrored.set_colorkey((255, 0, 255))
+            self.layers.append((strip, mirrored, period, speed, road_x + road_w))
+
+    def draw(self, surf, ticks):
+        # Samma takt som förut: 1 px per 6 ms (simulerad tid)
+        ticks = int(ticks)
+        scroll = (ticks // 6) % self.STRIPE
+        surf.blit(self.tile, (0, scroll - self.STRIPE))
+        for left, right, period, speed, right_x in self.layers:
+            off = int(ticks / 6 * speed) % period - period
+            surf.blit(left, (0, off))
+            surf.blit(right, (right_x, off))
+
+class ArcadeView:
+    """How an arcade mode looks. The rules come from `sim_class`; a new mode
+       is a new ArcadeSim subclass plus a view registered in ARCADE_VIEWS."""
+    sim_class = None
+    bg = (6, 8, 14)
+    road = (20, 22, 30)
+    obstacle_color = (170, 80, 80)
+    _background = None
+
+    def background(self):
+        if self._background is None:
+            self._background = RoadBackground(self.bg, self.road)
+        return self._background
+
+    def draw_entities(self, sim, atlas, dy=0):
+        """dy: how far the falling entities are drawn from their last simulated
+           position (negative: between the previous tick and the last one)."""
+        _draw_pool(sim.obstacles, atlas.get("obstacle"), self.obstacle_color, dy)
+
+    def draw_hud(self, sim):
+        pass
+
+class ChaseView(ArcadeView):
+    sim_class = ChaseSim
+
+    def draw_entities(self, sim, atlas, dy=0):
+        super().draw_entities(sim, atlas, dy)
         # Nina (om aktiv)
-        if nina_timer > 0:
-            if nina_img: screen.blit(nina_img, nina_rect)
-            else: pygame.draw.rect(screen, (255, 200, 50), nina_rect)
-
-        # spelarbilen
-        if car_img: screen.blit(car_img, car)
-        else: pygame.draw.rect(screen, (80, 180, 120), car)
-
-        # HUD
-        secs = (pygame.time.get_ticks() - start_ticks) // 1000
-        left = max(0, duration_sec - secs)
-        hud = f"Time {left}s   Hits {hits}/{max_hits}"
-        hud_surf = FONT_UI.render(hud, True, (230,235,255))
-        screen.blit(hud_surf, (16, 14))
+        if sim.nina_visible:
+            nina_img = atlas.get("nina")
+            if nina_img: screen.blit(nina_img, (sim.nina_x, sim.nina_y))
+            else: pygame.draw.rect(screen, (255, 200, 50), (sim.nina_x, sim.nina_y, CAR_W, CAR_H))
+
+    def draw_hud(self, sim):
+        screen.blit(_hud_text(f"Time {sim.time_left}s   Hits {sim.hits}/{sim.max_hits}", (230,235,255)), (16, 14))
+
+class TurboView(ArcadeView):
+    sim_class = TurboSim
+    bg = (10, 12, 20)
+    road = (30, 32, 44)
+    obstacle_color = (200, 80, 80)
+
+    def draw_entities(self, sim, atlas, dy=0):
+        super().draw_entities(sim, atlas, dy)
+        pick_img = atlas.get("pickup")
+        if pick_img:
+            _draw_pool(sim.pickups, pick_img, None, dy)
+        else:
+            for px, py in sim.pickups:
+                pygame.draw.circle(screen, (80,200,240), (px + PICKUP//2, py + dy + PICKUP//2), 18)
 
+    def draw_hud(self, sim):
+        # Turbo-mätare
+        bar_w = 200
+        filled = int((sim.collected / sim.needed) * bar_w)
+        pygame.draw.rect(screen, (80,80,80), (20,20, bar_w, 22), border_radius=6)
+        pygame.draw.rect(screen, (120,220,120), (20,20, filled, 22), border_radius=6)
+        screen.blit(_hud_text(f"TURBO {sim.collected}/{sim.needed}", (230,230,255)), (20, 50))
+        screen.blit(_hud_text(f"Hits {sim.hits}/{sim.max_hits}", (230,180,180)), (20, 75))
+
+ARCADE_VIEWS = {ARCADE_SCENE_KEY: ChaseView(), ARCADE_TURBO_KEY: TurboView()}
+
+def _arcade_events():
+    """Poll events during an arcade sequence; False when the player pressed ESC."""
+    for event in pygame.event.get():
+        if event.type == pygame.QUIT:
+            quit_game()
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
+            # Avbryt: ingen extra straff förutom utebliven vinst
+            return False
+        elif event.type == pygame.KEYDOWN and event.key == FULLSCREEN_KEY:
+            toggle_fullscreen()
+        elif event.type == pygame.KEYDOWN:
+            profiler_key(event.key)
+    return True
+
+def _steering():
+    keys = pygame.key.get_pressed()
+    return (keys[pygame.K_LEFT] or keys[pygame.K_a]), (keys[pygame.K_RIGHT] or keys[pygame.K_d])
+
+def draw_arcade_frame(sim, view, atlas, road, car_img, alpha=1.0):
+    """Draw `sim` `alpha` of the way from its previous tick to its last one
+       (1.0 = exactly the last simulated state)."""
+    # --- Rita scen: väg, mittstreck och vägkant i ett par blits ---
+    road.draw(screen, sim.elapsed_ms + (alpha - 1) * FRAME_MS)
+
+    # Allt som faller rör sig obstacle_speed px per steg
+    view.draw_entities(sim, atlas, round(sim.obstacle_speed * (alpha - 1)))
+
+    # spelarbilen
+    car_x = round(sim.prev_car_x + (sim.car_x - sim.prev_car_x) * alpha)
+    if car_img: screen.blit(car_img, (car_x, sim.car_y))
+    else: pygame.draw.rect(screen, (80, 180, 120), (car_x, sim.car_y, CAR_W, CAR_H))
+
+    view.draw_hud(sim)
+
+def run_arcade_mode(state, view, seed=None, **rules):
+    """Play the arcade sequence state["scene"] with `view` and report the
+       outcome to the engine. Same seed and same input give the same run.
+       The sim advances in fixed ticks paid for by the real time that has
+       passed (at most MAX_CATCHUP_MS per frame), so dropped frames or a
+       faster display change how often it is drawn, never how it plays."""
+    if seed is None:
+        seed = random.randrange(1 << 31)   # uttryckligt frö så att en tape kan spela upp körningen
+    samples = None
+    if TAPE is not None:
+        seed, samples = TAPE.arcade_start(state["scene"], seed)
+    replaying = samples is not None
+    steering = []           # "0".."3" per simuleringssteg: vänster = 1, höger = 2
+    sim = view.sim_class(seed=seed, **rules)
+    atlas = ARCADE_ATLAS.load()
+    car_img = atlas.get("car")
+    road = view.background()
+
+    outcome = ARCADE_ABORTED
+    acc_ms = 0.0            # verklig tid som ännu inte simulerats
+    clock.tick()            # tiden före första bilden räknas inte
+    while True:
+        PROFILER.frame(ARCADE_FRAME)
+        if replaying:
+            clock.tick()    # ingen frame-gräns vid uppspelning: ett steg per bild
+            PROFILER.mark(WAIT)
+            pygame.event.pump()
+            if len(steering) >= len(samples):
+                break       # inspelningen avbröts här (ESC)
+            code = int(samples[len(steering)])
+            left, right = code & 1, code >> 1
+            ticks, alpha = 1, 1.0
+        else:
+            acc_ms += min(clock.tick(FPS), MAX_CATCHUP_MS)
+            PROFILER.mark(WAIT)
+            if not _arcade_events():
+                break
+            left, right = _steering()
+            ticks = int(acc_ms // FRAME_MS)
+            acc_ms -= ticks * FRAME_MS
+            alpha = acc_ms / FRAME_MS
+        PROFILER.mark(EVENTS)
+        code = "0123"[bool(left) | bool(right) << 1]
+        result = None
+        for _ in range(ticks):
+            steering.append(code)
+            result = sim.step(left, right)
+            if result is not None:
+                alpha = 1.0
+                break
+        PROFILER.mark(UPDATE)
+        draw_arcade_frame(sim, view, atlas, road, car_img, alpha)
+        if PROFILE_OVERLAY:
+            draw_profile_overlay()
+        PROFILER.mark(BLIT)
         pygame.display.flip()
+        PROFILER.mark(FLIP)
 
         # --- Slutvillkor ---
-        if hits >= max_hits:
-            state["health"] = max(0, state["health"] - 1)
-            running = False
-        if left <= 0:
-            running = False
+        if result is not None:
+            outcome = result
+            break
 
+    if TAPE is not None:
+        TAPE.arcade_end(state["scene"], seed, "".join(steering), outcome)
     # Tillbaka till scen efter arkad
-    state["scene"] = state.get("return_scene", "S5A")
-    state["return_scene"] = None
+    state = finish_arcade(state, outcome)
+    SAVES.active.arcade(outcome, state)
     return state
 
-def run_arcade_turbo(state, needed=10, max_hits=3, speed_px=7):
-    """Arcade Turbo Mode: samla turbopaket för att aktivera hoppet mellan tornen."""
-    car = pygame.Rect(WIDTH//2 - 26, HEIGHT - 120, 52, 90)
-    obstacles = []
-    pickups = []
-    spawn_timer = 0
-    pickup_timer = 0
-    hits = 0
-    collected = 0
-
-    # Ladda grafik om det finns
-    car_img = None
-    obs_img = None
-    pick_img = None
-    try:
-        car_img = pygame.image.load(os.path.join(ASSETS_DIR, "arcade_car.png")).convert_alpha()
-        car_img = pygame.transform.smoothscale(car_img, (car.w, car.h))
-    except: pass
-    try:
-        obs_img = pygame.image.load(os.path.join(ASSETS_DIR, "arcade_obstacle.png")).convert_alpha()
-        obs_img = pygame.transform.smoothscale(obs_img, (50, 50))
-    except: pass
-    try:
-        pick_img = pygame.image.load(os.path.join(ASSETS_DIR, "arcade_pickup.png")).convert_alpha()
-        pick_img = pygame.transform.smoothscale(pick_img, (40, 40))
-    except: pass
+def run_arcade(state, seed=None, **rules):
+    """Biljakten (ChaseSim): överlev tiden, max_hits krockar kostar hälsa."""
+    return run_arcade_mode(state, ARCADE_VIEWS[ARCADE_SCENE_KEY], seed, **rules)
 
-    running = True
-    while running:
-        dt = clock.tick(FPS)
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit(); sys.exit()
-            elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
-                running = False
-
-        keys = pygame.key.get_pressed()
-        if keys[pygame.K_LEFT] or keys[pygame.K_a]:
-            car.x -= 7
-        if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
-            car.x += 7
-        car.x = max(0, min(WIDTH - car.w, car.x))
-
-        # Spawn hinder
-        spawn_timer += dt
-        if spawn_timer > 800:
-            spawn_timer = 0
-            ox = random.randint(20, WIDTH - 70)
-            obstacles.append(pygame.Rect(ox, -60, 50, 50))
-
-        # Spawn pickups
-        pickup_timer += dt
-        if pickup_timer > 1500:
-            pickup_timer = 0
-            px = random.randint(40, WIDTH - 80)
-            pickups.append(pygame.Rect(px, -50, 40, 40))
-
-        # Rörelse
-        for o in obstacles:
-            o.y += speed_px
-        for p in pickups:
-            p.y += speed_px
-
-        # Kollisioner
-        for o in obstacles[:]:
-            if o.colliderect(car):
-                hits += 1
-                obstacles.remove(o)
-        for p in pickups[:]:
-            if p.colliderect(car):
-                collected += 1
-                pickups.remove(p)
-
-        # Ta bort gamla
-        obstacles = [o for o in obstacles if o.y < HEIGHT + 60]
-        pickups = [p for p in pickups if p.y < HEIGHT + 40]
-
-        # Rita scen
-        screen.fill((10, 12, 20))
-        pygame.draw.rect(screen, (30, 32, 44), (int(WIDTH*0.18), 0, int(WIDTH*0.64), HEIGHT))
-
-        # Mittlinje
-        for y in range(0, HEIGHT, 40):
-            pygame.draw.rect(screen, (200,200,220), (WIDTH//2 - 5, (y + (pygame.time.get_ticks()//6)%40), 10, 20))
-
-        # Rita hinder
-        for o in obstacles:
-            if obs_img: screen.blit(obs_img, o)
-            else: pygame.draw.rect(screen, (200,80,80), o)
-
-        # Rita pickups
-        for p in pickups:
-            if pick_img: screen.blit(pick_img, p)
-            else: pygame.draw.circle(screen, (80,200,240), p.center, 18)
-
-        # Rita bil
-        if car_img: screen.blit(car_img, car)
-        else: pygame.draw.rect(screen, (80,180,120), car)
-
-        # HUD: turbo-mätare
-        bar_w = 200
-        filled = int((collected / needed) * bar_w)
-        pygame.draw.rect(screen, (80,80,80), (20,20, bar_w, 22), border_radius=6)
-        pygame.draw.rect(screen, (120,220,120), (20,20, filled, 22), border_radius=6)
-        txt = FONT_UI.render(f"TURBO {collected}/{needed}", True, (230,230,255))
-        screen.blit(txt, (20, 50))
+def run_arcade_turbo(state, seed=None, **rules):
+    """Turbo (TurboSim): samla turbopaket för att aktivera hoppet mellan tornen."""
+    return run_arcade_mode(state, ARCADE_VIEWS[ARCADE_TURBO_KEY], seed, **rules)
 
-        txt2 = FONT_UI.render(f"Hits {hits}/{max_hits}", True, (230,180,180))
-        screen.blit(txt2, (20, 75))
 
-        pygame.display.flip()
+def status_values(state):
+    """The part of the state shown in the status bar."""
+    return (state["health"], state["days_left"], state["suspicion"], state["windom_allies"])
 
-        # Slutvillkor
-        if hits >= max_hits:
-            state["health"] = max(0, state["health"] - 1)
-            state["scene"] = "E_DEAD"
-            running = False
-        elif collected >= needed:
-            # Turbo aktiverad – cutscene: hoppa till nästa torn
-            state["scene"] = state.get("return_scene", "S11")
-            running = False
-
-    return state
-
-
-def apply_effects(state, effects):
-    for e in effects or []:
-        op, key, val = e.get("op"), e.get("key"), e.get("value")
-        if op == "set":
-            state[key] = val
-        elif op == "inc":
-            state[key] = state.get(key, 0) + val
-    if state["health"] <= 0:
-        state["scene"] = "E_DEAD"
-    if state["days_left"] <= 0 and not state["scene"].startswith("E_"):
-        state["scene"] = "E_TIME"
-    return state
+_status_text = [None, None]   # [(språk, värden, sparplats), renderad yta]
 
 def draw_status_bar(state):
+    """Draw the status bar and return its rect (for dirty-rect updates)."""
     bar_h = 34
     rect = pygame.Rect(0, HEIGHT - bar_h, WIDTH, bar_h)
     pygame.draw.rect(screen, PANEL, rect)
     pygame.draw.line(screen, (45,50,70), (0, HEIGHT-bar_h), (WIDTH, HEIGHT-bar_h), 2)
-    info = f" {tr('status_health')}: {state['health']}   {tr('status_days')}: {state['days_left']}   {tr('status_susp')}: {state['suspicion']}   {tr('status_allies')}: {tr('yes') if state['windom_allies'] else tr('no')} "
-    txt = FONT_UI.render(info, True, (220,230,255))
-    screen.blit(txt, (12, HEIGHT - bar_h + 7))
+    key = (LANG, status_values(state), SAVES.slot)
+    if _status_text[0] != key:
+        info = f" {tr('status_health')}: {state['health']}   {tr('status_days')}: {state['days_left']}   {tr('status_susp')}: {state['suspicion']}   {tr('status_allies')}: {tr('yes') if state['windom_allies'] else tr('no')}   {tr('status_slot')}: {SAVES.slot} "
+        _status_text[:] = [key, FONT_UI.render(info, True, (220,230,255))]
+    screen.blit(_status_text[1], (12, HEIGHT - bar_h + 7))
+    return rect
+
+_SCENE_LAYOUTS = {}   # (scen, språk, font, bredd) -> färdiga rader och ytor
+
+def scene_layout(scene_key, font, max_width):
+    """Wrapped text lines plus rendered title, text and option surfaces for a scene."""
+    key = (scene_key, LANG, font, max_width)
+    lay = _SCENE_LAYOUTS.get(key)
+    if lay is None:
+        if len(_SCENE_LAYOUTS) > 64:
+            _SCENE_LAYOUTS.clear()   # stora story packs: håll bara de senaste scenerna
+        sc = PACK.text(scene_key, LANG)
+        lines = wrap_text(sc["text"], font, max_width)
+        lay = _SCENE_LAYOUTS[key] = {
+            "lines": lines,
+            "title": FONT_TITLE.render(sc["title"], True, WHITE),
+            "text": [font.render(line, True, (230,235,255)) for line in lines],
+            "options": [font.render(f"{idx}. {label}", True, (255,255,200))
+                        for idx, label in enumerate(sc["options"], start=1)],
+        }
+    return lay
 
 def draw_scene(state):
-    screen.fill(BG)
     sc = SCENES[state["scene"]]
-    title = sc["title"][LANG]
-    text  = sc["text"][LANG]
     img = load_scene_image(sc["image"])
-    screen.blit(img, (0,0))
-
-    title_surf = FONT_TITLE.render(title, True, WHITE)
-    screen.blit(title_surf, (24, int(HEIGHT*0.52)+18))
+    PROFILER.mark(IMAGES)
 
     panel_rect = pygame.Rect(20, int(HEIGHT*0.52)+70, WIDTH-40, int(HEIGHT*0.48)-110)
+    lay = scene_layout(state["scene"], FONT_TEXT, panel_rect.width-28)
+    PROFILER.mark(LAYOUT)
+
+    screen.fill(BG)
+    screen.blit(img, (0,0))
+    screen.blit(lay["title"], (24, int(HEIGHT*0.52)+18))
+
     pygame.draw.rect(screen, PANEL, panel_rect, border_radius=12)
     pygame.draw.rect(screen, (40,45,70), panel_rect, width=2, border_radius=12)
 
-    lines = wrap_text(text, FONT_TEXT, panel_rect.width-28)
     y = panel_rect.y + 14
-    for line in lines:
-        surf = FONT_TEXT.render(line, True, (230,235,255))
+    for surf in lay["text"]:
         screen.blit(surf, (panel_rect.x+14, y))
         y += FONT_TEXT.get_height() + 4
 
-    options = sc.get("options", [])
     y += 10
-    for idx, opt in enumerate(options, start=1):
-        label = f"{idx}. {opt['label'][LANG]}"
-        surf = FONT_TEXT.render(label, True, (255,255,200))
+    for surf in lay["options"]:
         screen.blit(surf, (panel_rect.x+14, y))
         y += FONT_TEXT.get_height() + 6
 
     draw_status_bar(state)
+    PROFILER.mark(BLIT)
 
-def show_end_and_wait_for_restart(state):
-    overlay_font = load_font(40)
-    sub_font = load_font(22)
-    prompt = tr("restart_prompt")
-
-    waiting = True
-    while waiting:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit(); sys.exit()
-            elif event.type in (pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN):
-                waiting = False
+# [(scen, språk, statusvärden, sparplats), färdig slutbild]: bara den senaste,
+# en helskärmsyta per slut vore för mycket minne för en bild som visas en gång
+_end_frame = [None, None]
 
+def compose_end_frame(state):
+    """The whole ending screen (scene, dimming, title, prompt, status bar) as one surface."""
+    key = (state["scene"], LANG, status_values(state), SAVES.slot)
+    frame = _end_frame[1] if _end_frame[0] == key else None
+    if frame is None:
         draw_scene(state)
-        s = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-        s.fill((0, 0, 0, 140))
-        screen.blit(s, (0, 0))
+        frame = screen.copy()
+        shade = pygame.Surface((WIDTH, HEIGHT))
+        shade.set_alpha(140)
+        frame.blit(shade, (0, 0))
 
-        title = SCENES[state["scene"]]["title"][LANG]
-        t_surf = overlay_font.render(title, True, (255, 230, 140))
-        screen.blit(t_surf, ((WIDTH - t_surf.get_width())//2, int(HEIGHT*0.30)))
+        title = PACK.text(state["scene"], LANG)["title"]
+        t_surf = load_font(40).render(title, True, (255, 230, 140))
+        frame.blit(t_surf, ((WIDTH - t_surf.get_width())//2, int(HEIGHT*0.30)))
 
-        p_surf = sub_font.render(prompt, True, (255, 200, 120))
-        screen.blit(p_surf, ((WIDTH - p_surf.get_width())//2, int(HEIGHT*0.62)))
+        p_surf = load_font(22).render(tr("restart_prompt"), True, (255, 200, 120))
+        frame.blit(p_surf, ((WIDTH - p_surf.get_width())//2, int(HEIGHT*0.62)))
+        _end_frame[:] = [key, frame]
+    return frame
 
-        pygame.display.flip()
-        clock.tick(FPS)
+def show_end_and_wait_for_restart(state):
+    frame = compose_end_frame(state)
+
+    # Tona in: scenen ritas en gång, sedan slutbilden med förberäknade alfasteg
+    steps = max(1, END_FADE_MS * FPS // 1000)
+    if steps > 1:
+        draw_scene(state)
+        under = screen.copy()
+        for alpha in [round(255 * (i + 1) / steps) for i in range(steps)]:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    quit_game()
+                elif event.type in (pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN):
+                    frame.set_alpha(None)
+                    return
+            frame.set_alpha(alpha)
+            screen.blit(under, (0, 0))
+            screen.blit(frame, (0, 0))
+            pygame.display.flip()
+            clock.tick(FPS)
+        frame.set_alpha(None)
+    screen.blit(frame, (0, 0))
+    pygame.display.flip()
+
+    # Bilden ändras inte längre: vänta på händelser i stället för att rita om
+    while True:
+        event = pygame.event.wait()
+        if event.type == pygame.QUIT:
+            quit_game()
+        elif event.type in (pygame.KEYDOWN, pygame.MOUSEBUTTONDOWN):
+            return
+        elif event.type in REDRAW_EVENTS:
+            screen.blit(frame, (0, 0))
+            pygame.display.flip()
 
 # =========================
 # Save / Load
 # =========================
-def save_game(state):
-    try:
-        with open(SAVE_PATH, "w", encoding="utf-8") as f:
-            json.dump(state, f, ensure_ascii=False, indent=2)
-        return True
-    except Exception as e:
-        print("Save error:", e)
-        return False
+SAVES = SaveSlots(SAVE_DIR, SAVE_SLOTS)
+
+def quit_game():
+    """Close the window mid-screen. The journal writer is a daemon thread, so
+       it is closed first or the records still in its queue would be lost."""
+    SAVES.close()
+    pygame.quit(); sys.exit()
+
+def save_game():
+    """Mark the current point of the active slot's journal as its save."""
+    SAVES.active.save()
 
 def load_game():
+    """State at the active slot's last save. Falls back to the old
+       savegame.json so saves from earlier versions still load."""
+    state = SAVES.active.load()
+    if state is not None:
+        return state
     try:
         with open(SAVE_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except:
+            state = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print("Load error:", e)
         return None
+    if not isinstance(state, dict) or set(state) != set(new_game_state()) or state["scene"] not in SCENES:
+        print("Load error: savegame.json does not match this version")
+        return None
+    return state
 
 # =========================
-# Scene stepping
+# Frame profiler
 # =========================
-def step_scene(state, choice_index):
-    sc = SCENES[state["scene"]]
-    options = sc.get("options", [])
-    if choice_index < 0 or choice_index >= len(options):
-        return state
-    opt = options[choice_index]
-
-    # Tillämpa eventuella effekter
-    apply_effects(state, opt.get("effects"))
-
-    goto = opt.get("goto", state["scene"])
-
-    # Special: arcade
-    if goto == ARCADE_SCENE_KEY or goto == "__ARCADE__":
-        # Om return_scene inte redan sattes via effects, defaulta till S5A
-        if not state.get("return_scene"):
-            state["return_scene"] = "S5A"
-        return run_arcade(state)
-
-    # Vanliga slut
-    if goto in ("E_GOOD","E_GREED","E_COWARD","E_TIME","E_DEAD"):
-        state["scene"] = goto
-        return state
-
-    # Normal scenväxling
-    state["scene"] = goto
-    return state
+PROFILER = FrameProfiler(enabled=PROFILE_ENABLED)
+PROFILE_OVERLAY = False
+PROFILE_GRAPH_FRAMES = 150  # staplar i grafen, 2 px var
+_PHASE_COLORS = ((0,0,0), (90,160,250), (120,220,120), (250,200,80), (230,120,230), (240,110,90), (170,170,180))
+
+def profiler_key(key):
+    """F9 toggles the frame-time graph (and the profiler with it, unless it
+       was switched on from the environment); F10 dumps the ring buffer."""
+    global PROFILE_OVERLAY
+    if key == PROFILE_KEY:
+        PROFILE_OVERLAY = not PROFILE_OVERLAY
+        if PROFILE_OVERLAY:
+            PROFILER.enable()
+        elif not PROFILE_ENABLED:
+            PROFILER.disable()
+    elif key == PROFILE_DUMP_KEY and PROFILER.enabled:
+        prefix = os.path.join(PROFILE_DIR, time.strftime("profile-%Y%m%d-%H%M%S"))
+        print("Profile written:", ", ".join(PROFILER.dump(prefix)))
+
+def draw_profile_overlay():
+    """Stacked per-phase bars for the last frames (time spent waiting left
+       out), a line at the frame budget, percentiles and a colour legend."""
+    frames = PROFILER.recent(PROFILE_GRAPH_FRAMES)
+    w, h = PROFILE_GRAPH_FRAMES * 2, 100
+    x0, y0 = WIDTH - w - 16, 12
+    screen.fill((0,0,0), (x0 - 4, y0 - 4, w + 8, h + 56))
+    scale = h / (2000 / FPS)    # grafens topp = två frames budget
+    x = x0
+    for _, _, d in frames:
+        y = y0 + h
+        for phase in range(EVENTS, len(PHASES)):
+            px = min(int(d[phase] * 1000 * scale), y - y0)
+            if px > 0:
+                y -= px
+                screen.fill(_PHASE_COLORS[phase], (x, y, 2, px))
+        x += 2
+    screen.fill((200,60,60), (x0, y0 + h - int(1000 / FPS * scale), w, 1))
+    busy = PROFILER.summary(frames)["busy"]
+    screen.blit(FONT_UI.render(f"p50 {busy['p50']:.1f}  p95 {busy['p95']:.1f}  p99 {busy['p99']:.1f} ms",
+                               True, (220,230,255)), (x0, y0 + h + 2))
+    lx = x0
+    for phase in range(EVENTS, len(PHASES)):
+        label = _hud_text(PHASES[phase], _PHASE_COLORS[phase])
+        screen.blit(label, (lx, y0 + h + 26))
+        lx += label.get_width() + 6
 
 # =========================
 # Game loop
 # =========================
+def _wait_events(timeout_ms):
+    """Sleep until at least one event arrives (or timeout_ms passes), then drain the queue."""
+    first = pygame.event.wait(timeout_ms)
+    if first.type == pygame.NOEVENT:
+        return []
+    return [first] + pygame.event.get()
+
 def run_game():
-    state = new_game_state()
+    # Autosparning: fortsätt där journalen slutade om spelet inte redan var slut.
+    # Stod den på en arkadnod startar sekvensen om direkt (arkad-kroken nedan).
+    state = SAVES.active.latest()
+    if (state is None or state["scene"].startswith("E_")
+            or (state["scene"] not in SCENES and state["scene"] not in ARCADE_KEYS)):
+        state = new_game_state()
+    replaying = TAPE is not None and TAPE.replaying
+    if TAPE is not None:
+        state = TAPE.begin(state, LANG)
+    SAVES.active.start(state)
+    event_driven = RENDER_MODE == "event"
+    ARCADE_ATLAS.load()     # sprites och vägbakgrunder byggs en gång, innan första arkadsekvensen
+    for view in ARCADE_VIEWS.values():
+        view.background()
+    shown_scene = None
+    drawn_frame = None      # (scen, språk) som ligger på skärmen just nu
+    drawn_status = None
+    frame_no = 0            # varv i loopen; tangenter spelas in per varv
     running = True
     while running:
-        clock.tick(FPS)
+        frame_no += 1
+        PROFILER.frame(STORY_FRAME)
+        if replaying:
+            pygame.event.pump()
+            keys = TAPE.keys(frame_no)
+            events = ([pygame.event.Event(pygame.KEYDOWN, key=k) for k in keys] if keys is not None
+                      else [pygame.event.Event(pygame.QUIT)])
+        elif event_driven:
+            events = _wait_events(IDLE_WAIT_MS) if drawn_frame is not None else pygame.event.get()
+            clock.tick()    # håll klockan färsk så arkadens första dt blir liten
+        else:
+            clock.tick(FPS)
+            events = pygame.event.get()
+        if TAPE is not None and not replaying:
+            TAPE.keys(frame_no, [e.key for e in events if e.type == pygame.KEYDOWN])
+        PROFILER.mark(WAIT)
+        PREFETCHER.collect()
 
         # --- input ---
-        for event in pygame.event.get():
+        for event in events:
             if event.type == pygame.QUIT:
                 running = False
 
+            elif event.type in REDRAW_EVENTS:
+                drawn_frame = None
+
             elif event.type == pygame.KEYDOWN:
                 if pygame.K_1 <= event.key <= pygame.K_9:
                     idx = event.key - pygame.K_1
-                    state = step_scene(state, idx)
+                    scene = state["scene"]
+                    if scene in SCENES and idx < len(SCENES[scene].get("options", ())):
+                        state = choose(state, idx)
+                        SAVES.active.choice(idx, state)
 
                 elif event.key == pygame.K_ESCAPE:
                     running = False
 
                 elif event.key == pygame.K_s:
-                    save_game(state)
+                    save_game()
 
                 elif event.key == pygame.K_l:
                     loaded = load_game()
+                    if TAPE is not None:
+                        loaded = TAPE.loaded(frame_no, loaded)
                     if loaded:
                         state = loaded
+                        SAVES.active.start(state)
+
+                elif pygame.K_F1 <= event.key < pygame.K_F1 + SAVE_SLOTS:
+                    SAVES.select(event.key - pygame.K_F1 + 1, state)
+                    drawn_status = None
+
+                elif event.key in (PROFILE_KEY, PROFILE_DUMP_KEY):
+                    profiler_key(event.key)
+                    drawn_frame = None
+
+                elif event.key == FULLSCREEN_KEY:
+                    toggle_fullscreen()
+                    drawn_frame = None
+        PROFILER.mark(EVENTS)
 
         # === ARCADE HOOKS (läggs direkt efter input-hanteringen) ===
-        if state["scene"] == "__ARCADE__":
-            state = run_arcade(state)          # vanlig chase-arcade
+        if state["scene"] in ARCADE_VIEWS:
+            state = run_arcade_mode(state, ARCADE_VIEWS[state["scene"]])
+            drawn_frame = None
             continue                           # rita inte textscen samma frame
-
-        if state["scene"] == "__ARCADE_TURBO__":
-            state = run_arcade_turbo(state)    # turbo-samlings-arcade
-            continue
         # ===========================================================
 
         # --- slutscener: visa overlay och tillbaka till start ---
         if state["scene"].startswith("E_"):
-            show_end_and_wait_for_restart(state)
-            start_img_path = os.path.join(ASSETS_DIR, "start_screen.png")
-            show_start_screen(screen, clock, start_img_path)
+            if not replaying:
+                show_end_and_wait_for_restart(state)
+                start_img_path = os.path.join(ASSETS_DIR, "start_screen.png")
+                show_start_screen(screen, clock, start_img_path)
             state = new_game_state()
+            SAVES.active.start(state)
+            drawn_frame = None
             continue
 
         # --- säkerhetskontroller ---
-        if state["health"] <= 0:
-            state["scene"] = "E_DEAD"
-        if state["days_left"] <= 0 and not state["scene"].startswith("E_"):
-            state["scene"] = "E_TIME"
+        check_state(state)
 
         # --- render ---
-        draw_scene(state)
-        pygame.display.flip()
-
+        if state["scene"] != shown_scene:
+            shown_scene = state["scene"]
+            PREFETCHER.enter_scene(shown_scene)
+            PACK.prefetch(scene_successors(shown_scene), LANG)
+        PROFILER.mark(UPDATE)
+        frame = (state["scene"], LANG)
+        if frame != drawn_frame or not event_driven or PROFILE_OVERLAY:
+            draw_scene(state)
+            if PROFILE_OVERLAY:
+                draw_profile_overlay()
+                PROFILER.mark(BLIT)
+            pygame.display.flip()
+            PROFILER.mark(FLIP)
+            drawn_frame, drawn_status = frame, status_values(state)
+        elif status_values(state) != drawn_status:
+            # Samma scen men nya värden (t.ex. efter laddning): bara statusraden
+            rect = draw_status_bar(state)
+            PROFILER.mark(BLIT)
+            pygame.display.update(rect)
+            PROFILER.mark(FLIP)
+            drawn_status = status_values(state)
+
+    if TAPE is not None:
+        TAPE.end(state)
+    if PROFILE_DUMP:
+        PROFILER.dump(PROFILE_DUMP)
+    PREFETCHER.shutdown()
+    SAVES.close()
     pygame.quit()
 
 # =========================
@@ -902,8 +1272,16 @@ def run_game():
 if __name__ == "__main__":
     if not os.path.isdir(ASSETS_DIR):
         print("Tip: Create an 'assets' folder next to this script and place your images there.")
+    elif missing_images(STORY, ASSETS_DIR):
+        print("Missing scene images (placeholders will be shown):", ", ".join(missing_images(STORY, ASSETS_DIR)))
+    init_display()
+    # Avkoda startbilden och första scenen medan språkväljaren visas
+    start_img_path = os.path.join(ASSETS_DIR, "start_screen.png")
+    TITLE_ASSETS.warm(start_img_path, screen.get_size())
+    PREFETCHER.schedule([PACK.start])
     # Choose language once, then show start screen in that language
     choose_language(screen, clock)
-    start_img_path = os.path.join(ASSETS_DIR, "start_screen.png")
     show_start_screen(screen, clock, start_img_path)
+    if RECORD_PATH:
+        TAPE = InputRecorder(RECORD_PATH)
     run_game()
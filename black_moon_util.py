@@ -0,0 +1,44 @@
+"""Small helpers shared by the Black Moon modules and tools.
+
+One-line JSON records (journal, tapes, the server protocol), p50/p95/p99
+summaries of timings, and atomic file writes: the data goes to <path>.tmp
+and is renamed over <path>, so a reader or a crash sees either the old file
+or the new one, never half of it. Standard library only, so everything that
+imports this stays free of pygame.
+"""
+import os, json
+
+QUANTILES = (("p50", .50), ("p95", .95), ("p99", .99))
+
+
+def json_line(obj):
+    """`obj` as one compact JSON line, newline included."""
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted sequence; 0.0 when empty."""
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))] if sorted_values else 0.0
+
+
+def percentiles(values, scale=1, digits=3):
+    """{"p50", "p95", "p99"} of `values`, multiplied by `scale` and rounded."""
+    values = sorted(values)
+    return {name: round(percentile(values, q) * scale, digits) for name, q in QUANTILES}
+
+
+def write_atomic(path, data, fsync=False):
+    """Replace `path` with `data` (bytes, or str written as UTF-8). With
+       fsync the data is on disk before the rename makes it visible."""
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data if isinstance(data, bytes) else data.encode("utf-8"))
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def write_json(path, data, **dump_args):
+    """write_atomic() of `data` as JSON; `dump_args` go to json.dumps (indent, ...)."""
+    write_atomic(path, json.dumps(data, **dump_args))